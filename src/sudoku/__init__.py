@@ -1,2 +1,3 @@
 from src.sudoku.cell import Cell
-from src.sudoku.grid import Grid
\ No newline at end of file
+from src.sudoku.grid import Grid
+from src.sudoku.parser import ParseError
@@ -0,0 +1,150 @@
+import collections
+import multiprocessing
+import os
+from typing import Iterable, Iterator, NamedTuple
+
+from src.sudoku import parser
+from src.sudoku.grid import SOLVE_MODES, Grid
+
+# Puzzles cross the process boundary as lines of givens, both ways; Grids never get pickled.
+
+
+class SolveResult(NamedTuple):
+    index: int  # Position of the puzzle in the input
+    puzzle: str
+    solution: str | None = None
+    path: str | None = None  # 'logical', 'search' or 'exact', as returned by Grid.solve
+    error: str | None = None
+
+
+def _check_mode(mode: str) -> None:
+    if mode not in SOLVE_MODES:
+        raise ValueError(f'Invalid solve mode {mode!r}')
+
+
+def _solve_one(item: tuple[int, str], mode: str = 'hybrid') -> SolveResult:
+    index, puzzle = item
+    try:
+        grid = Grid.text_to_grid(puzzle)
+        path = grid.solve(mode=mode)
+    except Exception as e:
+        return SolveResult(index, puzzle, error=f'{type(e).__name__}: {e}')
+    return SolveResult(index, puzzle, parser.format_line(grid.masks), path)
+
+
+def _solve_chunk(args: tuple[str, list[tuple[int, str]]]) -> list[SolveResult]:
+    mode, items = args
+    return [_solve_one(item, mode) for item in items]
+
+
+def _chunks(items: Iterable[tuple[int, str]], chunksize: int, mode: str):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield mode, chunk
+            chunk = []
+    if chunk:
+        yield mode, chunk
+
+
+def solve_many(puzzles: Iterable[str], workers: int | None = None, chunksize: int | None = None,
+               ordered: bool = True, mode: str = 'hybrid') -> Iterator[SolveResult]:
+    # Yields one SolveResult per puzzle. A puzzle that fails carries its error instead of stopping the batch.
+    # ordered=False yields results as chunks finish, which keeps every worker busy on uneven batches.
+    _check_mode(mode)
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        try:
+            chunksize = max(1, min(256, len(puzzles) // (workers * 4)))
+        except TypeError:
+            chunksize = 64
+    return _solve_many(((i, puzzle.strip()) for i, puzzle in enumerate(puzzles)), workers, chunksize, ordered, mode)
+
+
+def _solve_many(items: Iterator[tuple[int, str]], workers: int, chunksize: int, ordered: bool,
+                mode: str) -> Iterator[SolveResult]:
+    if workers == 1:
+        for item in items:
+            yield _solve_one(item, mode)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        run = pool.imap if ordered else pool.imap_unordered
+        for results in run(_solve_chunk, _chunks(items, chunksize, mode)):
+            yield from results
+
+
+# File to file: one puzzle per input line, one record per output line, in input order.
+# A record is puzzle, solution (empty on failure), path or error, and the byte offset in the
+# source just past the puzzle, tab separated. The last complete record is where a rerun resumes.
+
+
+def _read_puzzles(path: str | os.PathLike, offset: int) -> Iterator[tuple[int, str]]:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            offset += len(raw)
+            line = raw.strip()
+            if not line or line.startswith(b'#'):
+                continue
+            yield offset, line.decode()
+
+
+def _resume_offset(path: str | os.PathLike) -> int:
+    # Drops any partly written record at the end of path, and returns the offset the last full one got to.
+    try:
+        f = open(path, 'rb+')
+    except FileNotFoundError:
+        return 0
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        block = 4096
+        while True:
+            start = max(0, end - block)
+            f.seek(start)
+            lines = f.read().split(b'\n')
+            # lines[-1] is what follows the last newline; lines[-2] is only known to be whole if it has a newline before it.
+            if len(lines) > 2 or start == 0:
+                break
+            block *= 2
+        f.truncate(end - len(lines[-1]))
+        if len(lines) < 2:
+            return 0
+        return int(lines[-2].rsplit(b'\t', 1)[1])
+
+
+def _format_record(result: SolveResult) -> str:
+    return f'{result.puzzle}\t{result.solution or ""}\t{result.path or result.error}\t{result.index}\n'
+
+
+def _solve_window(items: Iterator[tuple[int, str]], workers: int, window: int, chunksize: int,
+                  mode: str) -> Iterator[SolveResult]:
+    # Never more than window puzzles read ahead of what's been yielded.
+    if workers == 1:
+        for item in items:
+            yield _solve_one(item, mode)
+        return
+    pending = collections.deque()
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in _chunks(items, chunksize, mode):
+            pending.append(pool.apply_async(_solve_chunk, (chunk,)))
+            if len(pending) * chunksize >= window:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def solve_file(source: str | os.PathLike, destination: str | os.PathLike, workers: int | None = None,
+               window: int = 4096, chunksize: int = 64, mode: str = 'hybrid', resume: bool = False) -> int:
+    # Solves every puzzle in source into destination, returning how many were written this run.
+    # With resume=True, carries on after the last complete record already in destination.
+    _check_mode(mode)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(chunksize, window))
+    offset = _resume_offset(destination) if resume else 0
+    written = 0
+    with open(destination, 'a' if resume else 'w') as out:
+        for result in _solve_window(_read_puzzles(source, offset), workers, window, chunksize, mode):
+            out.write(_format_record(result))
+            written += 1
+    return written
@@ -1,111 +1,156 @@
+from array import array
 from typing import Iterable
 from src.sudoku import constants as c
+from src.sudoku import utilities as u
+from src.sudoku import indices as ix
 
 class Cell:
-    def __init__(self, *candidates : int, row : int = None, column : int = None):
-        self._length = None
-        self.solved = False
-        self.previously_solved = False
-            # TODO: Change how this works? IDK If I like current implementation.
-        self.value = None
+    # A Cell either owns a one-slot mask store, or is a view onto a slot of a Grid's store.
+    __slots__ = ('row', 'column', 'index', 'chute', 'strip', 'box', 'box_cell', '_hash',
+                 '_store', '_slot', '_owner', 'previously_solved', '_internal_changed')
 
-        self.row = row
-        if self.row not in c.VALID_ROWS:
+    def __init__(self, *candidates : int, row : int = None, column : int = None):
+        if row not in c.VALID_ROWS:
             raise ValueError("Invalid row")
-        self.column = column
-        if self.column not in c.VALID_COLUMNS:
+        if column not in c.VALID_COLUMNS:
             raise ValueError("Invalid column")
-        self._hash = hash((self.row, self.column))
-        self.chute = self.column // 3
-        self.strip = self.row // 3
-        self.box = (self.strip * 3) + self.chute
-        self.box_cell = (self.column % 3) + ((self.row % 3) * 3)
+        self._place(ix.cell_index(row, column))
+        self.previously_solved = False
+            # TODO: Change how this works? IDK If I like current implementation.
 
         if not candidates: # Default is everything
-            temp_list = list(c.VALID_CANDIDATES)
+            mask = c.FULL_MASK
         else:
-            temp_list = []
+            mask = 0
             for candidate in candidates:
                 if not isinstance(candidate, int):
                     raise TypeError("Candidates must be integers")
                 if candidate not in c.VALID_CANDIDATES:
                     raise ValueError(f"Candidate {candidate} not in {c.VALID_CANDIDATES}")
-                if candidate in temp_list:
+                bit = u.digit_mask(candidate)
+                if mask & bit:
                     raise ValueError(f"Candidate {candidate} already exists")
-                temp_list.append(candidate)
-        temp_list.sort()
-        self._candidates = tuple(temp_list)
-        if len(self) == 1:
-            self.solved = True
-            self.value = self._candidates[0]
+                mask |= bit
+        self._store = array(u.MASK_TYPECODE, (mask,))
+        self._slot = 0
+        self._owner = None
         self._internal_changed = False
 
+    @classmethod
+    def view(cls, store: array, index: int, owner=None) -> "Cell":
+        # owner, if given, is told about every change through owner.write_mask(index, mask).
+        cell = cls.__new__(cls)
+        cell._place(index)
+        cell._store = store
+        cell._slot = index
+        cell._owner = owner
+        cell.previously_solved = False
+        cell._internal_changed = False
+        return cell
+
+    def _place(self, index: int) -> None:
+        self.index = index
+        self.row = ix.ROW_OF[index]
+        self.column = ix.COLUMN_OF[index]
+        self._hash = hash((self.row, self.column))
+        self.chute = ix.CHUTE_OF[index]
+        self.strip = ix.STRIP_OF[index]
+        self.box = ix.BOX_OF[index]
+        self.box_cell = ix.BOX_CELL_OF[index]
+
+    def attach(self, store: array, owner=None) -> None:
+        # View store from now on. Whoever owns store is expected to have copied this cell's candidates over already.
+        self._store = store
+        self._slot = self.index
+        self._owner = owner
+
+    def is_view_of(self, store: array) -> bool:
+        return self._store is store
+
+    @property
+    def detached(self) -> bool:
+        # Only a free-standing cell owns a store with a single slot.
+        return len(self._store) == 1
+
     def __hash__(self) -> int:
         return self._hash
 
     def __repr__(self) -> str:
-        candidates = list(self.candidates)
-        candidates.sort()
-        candidates = [str(x) for x in candidates]
+        candidates = [str(x) for x in self]
         return f"R{self.row}C{self.column}Cell({', '.join(candidates)})"
 
 
     def __iter__(self):
-        return iter(self._candidates)
+        return iter(u.mask_to_digits(self._store[self._slot]))
 
     def __contains__(self, item) -> bool:
-        return item in self._candidates
+        if not isinstance(item, int) or item < 1:
+            return False
+        return bool(self._store[self._slot] >> (item - 1) & 1)
 
     def __len__(self):
-        if self._length is None:
-            self._length = len(self._candidates)
-        return self._length
+        return self._store[self._slot].bit_count()
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, Cell):
             return NotImplemented
         return self.row == other.row and self.column == other.column
 
+    @property
+    def mask(self) -> int:
+        return self._store[self._slot]
+
+    @property
+    def solved(self) -> bool:
+        mask = self._store[self._slot]
+        return mask != 0 and not mask & (mask - 1)
+
+    @property
+    def value(self) -> int | None:
+        return u.mask_value(self._store[self._slot])
+
     @property
     def candidates(self) -> set[int]:
-        return {*self._candidates}
+        return set(u.mask_to_digits(self._store[self._slot]))
 
     @candidates.setter
     def candidates(self, candidates : Iterable[int]) -> None:
-        if not self.solved and set(candidates) != set(self.candidates):
+        self.set_mask(u.digits_to_mask(candidates))
+
+    def set_mask(self, mask: int) -> None:
+        # Solved cells are frozen; everything else takes the new mask as-is.
+        solved = self.solved
+        if not solved and mask != self._store[self._slot]:
             self._internal_changed = True
-        self.previously_solved = self.solved
-        if not self.previously_solved:
-            self._candidates = tuple(candidates)
-            self._length = None
-            if len(self) == 1:
-                self.solved = True
-                self.value = self._candidates[0]
+        self.previously_solved = solved
+        if not solved:
+            if self._owner is None:
+                self._store[self._slot] = mask
             else:
-                self.solved = False
-                self.value = None
+                self._owner.write_mask(self.index, mask)
 
     def remove(self, value: int | Iterable[int]) -> None: #TODO fix
-        x = self.candidates
         if isinstance(value, int):
-            value = [value]
-        for val in value:
-            x.discard(val)
-        self.candidates = x
+            self.remove_mask(1 << (value - 1))
+        else:
+            self.remove_mask(u.digits_to_mask(value))
+
+    def remove_mask(self, mask: int) -> None:
+        self.set_mask(self._store[self._slot] & ~mask)
 
     def equals(self, value: int) -> None: #TODO: fix
-        self.candidates = [value]
+        self.set_mask(u.digit_mask(value))
 
     def sees(self, cell: "Cell") -> bool:
-        #TODO: timeit
-        return self.inclusive_sees(cell) and self != cell
+        return bool(ix.PEER_MASKS[self.index] >> cell.index & 1)
 
     def inclusive_sees(self, cell: "Cell") -> bool:
-        return self.row == cell.row or self.column == cell.column or self.box == cell.box
+        return self.index == cell.index or bool(ix.PEER_MASKS[self.index] >> cell.index & 1)
 
     def seen_by(self, *cells: "Cell") -> bool:
+        reach = ix.PEER_MASKS[self.index] | (1 << self.index)
         for cell in cells:
-            if self.inclusive_sees(cell):
+            if reach >> cell.index & 1:
                 return True
         return False
 
@@ -129,19 +174,25 @@ class Cell:
                 return False
         return True
 
-    def intersection(self, x : Iterable[int], /):
-        if not isinstance(x, Cell) and not isinstance(x, set):
-            raise TypeError("Input must be cell or set")
+    @staticmethod
+    def _as_mask(x, /) -> int:
         if isinstance(x, Cell):
-            x = x.candidates
-        return self.candidates.intersection(x)
+            return x.mask
+        if isinstance(x, set):
+            return u.digits_to_mask(x)
+        raise TypeError("Input must be cell or set")
+
+    def intersection(self, x : Iterable[int], /):
+        return set(u.mask_to_digits(self._store[self._slot] & self._as_mask(x)))
 
     def union(self, x, /):
-        if not isinstance(x, Cell) and not isinstance(x, set):
-            raise TypeError("Input must be cell or set")
-        if isinstance(x, Cell):
-            x = x.candidates
-        return self.candidates.union(x)
+        return set(u.mask_to_digits(self._store[self._slot] | self._as_mask(x)))
+
+    def intersection_mask(self, x: "Cell | int", /) -> int:
+        return self._store[self._slot] & (x if isinstance(x, int) else x.mask)
+
+    def union_mask(self, x: "Cell | int", /) -> int:
+        return self._store[self._slot] | (x if isinstance(x, int) else x.mask)
 
     @property
     def changed(self) -> bool:
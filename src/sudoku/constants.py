@@ -1,4 +1,14 @@
-MAGIC_NUM = 9
+import os
+
+# Boxes are BOX_SIZE by BOX_SIZE, so a grid is MAGIC_NUM by MAGIC_NUM: 2 (4x4), 3 (9x9), 4 (16x16) or 5 (25x25).
+# Every table is built once, at import, for this size; set SUDOKU_BOX_SIZE before importing to pick another.
+# The size is process-wide, not per Grid: one process can't hold grids of two sizes, and a puzzle of any other
+# size fails to parse. Pool workers (bulk, server) inherit the setting from the environment, so mixed sizes
+# need a process per size.
+BOX_SIZE = int(os.environ.get('SUDOKU_BOX_SIZE', 3))
+if not 2 <= BOX_SIZE <= 5:
+    raise ValueError(f'Box size {BOX_SIZE} not in 2 to 5')
+MAGIC_NUM = BOX_SIZE * BOX_SIZE
 
 ROWS = MAGIC_NUM
 COLUMNS = MAGIC_NUM
@@ -8,6 +18,12 @@ VALID_CANDIDATES = set(range(1, MAGIC_NUM + 1))
 VALID_ROWS = set(range(ROWS))
 VALID_COLUMNS = set(range(COLUMNS))
 
+# Candidate d is stored as bit (d - 1), so a cell holding every candidate is FULL_MASK.
+FULL_MASK = (1 << MAGIC_NUM) - 1
+
+# How candidate d is written, at SYMBOLS[d - 1]: digits first, then letters past 9.
+SYMBOLS = '123456789ABCDEFGHIJKLMNOP'[:MAGIC_NUM]
+
 # Yeah, I know this is probably a silly way to set this up.
 # But I think it might be fun to mess with the numbers later,
 # Or generalize things for different units.
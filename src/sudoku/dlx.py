@@ -0,0 +1,177 @@
+from array import array
+from typing import Generator, Iterable
+
+from src.sudoku import constants as c
+from src.sudoku import indices as ix
+from src.sudoku import utilities as u
+
+# Algorithm X with dancing links over the exact-cover form of a grid.
+# Columns are constraints: every cell holds one digit, and every unit holds every digit once.
+# Rows are candidates, one per (cell, digit), each with a node in four columns.
+# Node 0 is the root, nodes 1..COLUMN_COUNT the column headers, and row r's nodes follow contiguously.
+
+COLUMN_COUNT = ix.CELL_COUNT + ix.UNIT_COUNT * c.MAGIC_NUM
+ROW_COUNT = ix.CELL_COUNT * c.MAGIC_NUM
+_NODES_PER_ROW = 4
+
+
+def _build():
+    node_count = 1 + COLUMN_COUNT + ROW_COUNT * _NODES_PER_ROW
+    left = list(range(-1, node_count - 1))
+    right = list(range(1, node_count + 1))
+    up = list(range(node_count))
+    down = list(range(node_count))
+    column = list(range(node_count))
+    row_of = [-1] * node_count
+    size = [0] * (COLUMN_COUNT + 1)
+    left[0] = COLUMN_COUNT
+    right[COLUMN_COUNT] = 0
+    node = COLUMN_COUNT + 1
+    for i in range(ix.CELL_COUNT):
+        for digit_index in range(c.MAGIC_NUM):
+            row = i * c.MAGIC_NUM + digit_index
+            columns = [1 + i] + [1 + ix.CELL_COUNT + unit * c.MAGIC_NUM + digit_index for unit in ix.CELL_UNITS[i]]
+            first = node
+            for col in columns:
+                left[node] = node - 1 if node != first else first + _NODES_PER_ROW - 1
+                right[node] = node + 1 if node != first + _NODES_PER_ROW - 1 else first
+                # Append at the bottom of the column.
+                up[node] = up[col]
+                down[node] = col
+                down[up[col]] = node
+                up[col] = node
+                column[node] = col
+                row_of[node] = row
+                size[col] += 1
+                node += 1
+    return (left, right, up, down, size), tuple(column), tuple(row_of)
+
+
+_TEMPLATE, _COLUMN, _ROW_OF = _build()
+
+
+class DancingLinks:
+    # One engine can be loaded with any number of grids in turn; loading only copies the links back.
+    def __init__(self):
+        self._links = tuple(list(links) for links in _TEMPLATE)
+        self._left, self._right, self._up, self._down, self._size = self._links
+        self._solution = []
+
+    def load(self, masks: Iterable[int]) -> None:
+        for links, template in zip(self._links, _TEMPLATE):
+            links[:] = template
+        self._solution.clear()
+        up, down, size = self._up, self._down, self._size
+        for i, mask in enumerate(masks):
+            # Candidates that are already gone take their rows out of the matrix.
+            for digit_index in ix.bits(~mask & c.FULL_MASK):
+                first = 1 + COLUMN_COUNT + (i * c.MAGIC_NUM + digit_index) * _NODES_PER_ROW
+                for node in range(first, first + _NODES_PER_ROW):
+                    up[down[node]] = up[node]
+                    down[up[node]] = down[node]
+                    size[_COLUMN[node]] -= 1
+
+    def count_solutions(self, masks: Iterable[int], limit: int = 2) -> int:
+        # Stops counting once limit is reached; limit=2 is enough to tell unique from not.
+        self.load(masks)
+        return self._count(limit)
+
+    def solutions(self, masks: Iterable[int]) -> Generator[array, None, None]:
+        # Each solution as a fresh array of solved masks.
+        self.load(masks)
+        for rows in self._search():
+            solution = array(u.MASK_TYPECODE, (0,)) * ix.CELL_COUNT
+            for row in rows:
+                solution[row // c.MAGIC_NUM] = 1 << (row % c.MAGIC_NUM)
+            yield solution
+
+    def _choose(self) -> int:
+        # The column with the fewest rows left, 0 if every column is covered.
+        right, size = self._right, self._size
+        col = right[0]
+        best = col
+        best_size = ROW_COUNT + 1
+        while col:
+            s = size[col]
+            if s < best_size:
+                best, best_size = col, s
+                if s < 2:
+                    break
+            col = right[col]
+        return best
+
+    def _cover(self, col: int) -> None:
+        left, right, up, down, size = self._links
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                size[_COLUMN[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def _uncover(self, col: int) -> None:
+        left, right, up, down, size = self._links
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                size[_COLUMN[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    def _select(self, node: int) -> None:
+        right = self._right
+        j = right[node]
+        while j != node:
+            self._cover(_COLUMN[j])
+            j = right[j]
+
+    def _deselect(self, node: int) -> None:
+        left = self._left
+        j = left[node]
+        while j != node:
+            self._uncover(_COLUMN[j])
+            j = left[j]
+
+    def _count(self, limit: int) -> int:
+        col = self._choose()
+        if not col:
+            return 1
+        down = self._down
+        count = 0
+        self._cover(col)
+        node = down[col]
+        while node != col and count < limit:
+            self._select(node)
+            count += self._count(limit - count)
+            self._deselect(node)
+            node = down[node]
+        self._uncover(col)
+        return count
+
+    def _search(self) -> Generator[list[int], None, None]:
+        col = self._choose()
+        if not col:
+            yield self._solution
+            return
+        down = self._down
+        solution = self._solution
+        self._cover(col)
+        node = down[col]
+        while node != col:
+            solution.append(_ROW_OF[node])
+            self._select(node)
+            yield from self._search()
+            self._deselect(node)
+            solution.pop()
+            node = down[node]
+        self._uncover(col)
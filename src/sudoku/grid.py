@@ -1,11 +1,19 @@
+import collections
 import itertools
-from typing import Optional, Generator, Iterable, Any
-import re
+from array import array
+from types import MappingProxyType
+from typing import Optional, Generator, Iterable, Any, Sequence, Mapping, NamedTuple
 import functools
 import inspect
 
 from src.sudoku.cell import Cell
+from src.sudoku.journal import ChangeJournal
 from src.sudoku import constants as c
+from src.sudoku import utilities as u
+from src.sudoku import indices as ix
+from src.sudoku import parser
+from src.sudoku import dlx
+from src.sudoku.scheduler import Scheduler, first_hit
 
 
 def _table_settings(*groups: Iterable[Any]) -> Generator[tuple[Any, ...], None, None]:
@@ -23,11 +31,9 @@ def _each_division(func):
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
         for x in range(c.MAGIC_NUM):
-            for _func in {self.row, self.column,
-                          self.box}:  # TODO: if don't just remove this, make that a tuple or list
+            for offset in (ix.ROW_UNIT, ix.COLUMN_UNIT, ix.BOX_UNIT):
                 # TODO: also, switch this. Should go by units, then numbers. Weird to do it like this tbh.
-                cells = _func(x)
-                result = func(self, *args, **kwargs, _cells=cells)
+                result = func(self, *args, **kwargs, _unit=offset + x)
                 if result is True:
                     return True
         return None
@@ -43,17 +49,30 @@ def _transformation(func):
     return wrapper
 
 
+_EXACT_COVER = dlx.DancingLinks()  # Shared, so counting doesn't allocate per grid
+
+SOLVE_MODES = ('logical', 'search', 'hybrid', 'exact')
+
+
+class _Snapshot(NamedTuple):
+    masks: array
+    positions: array
+    link_units: tuple[int, ...]
+    bi_value_bits: int
+    tri_value_bits: int
+    pairs: dict[int, int]
+    queue: tuple[int, ...]
+
+
 class Grid:
+    # Step mode (the default) has each strategy stop at its first deduction, which is what hints want.
+    # With apply_all set, each strategy applies every deduction it finds in one pass before returning.
+    apply_all = False
+    # While search runs, write_mask only keeps the masks, appending (index, old mask) here for backtracking.
+    _trail: Optional[list[tuple[int, int]]] = None
+
     def __init__(self, *cells: Cell):
-        self._rows = []
-        self._columns = []
-        self._boxes = []
-        for x in range(c.MAGIC_NUM):
-            for _list in [self._rows, self._columns, self._boxes]:
-                _list.append([None for _ in range(c.MAGIC_NUM)])
-        for row_num in range(c.MAGIC_NUM):
-            for col_num in range(c.MAGIC_NUM):
-                self._set_cell(Cell(row=row_num, column=col_num))
+        self._init_state(array(u.MASK_TYPECODE, (c.FULL_MASK,)) * ix.CELL_COUNT)
         # TODO: tuples of lists instead of list of lists?
         for cell in cells:
             if not isinstance(cell, Cell):
@@ -62,56 +81,87 @@ class Grid:
                 # Then convert to Cell.
                 raise TypeError(f'cell must be Cell, not {type(cell)}')
             self._set_cell(cell)
-        self._bi_value_cells = []
-        self._tri_value_cells = []
-        self._strong_links = None
-        self._clear_cell_collections = True
         self._reset_grid_state(had_changes=True)
-        self._basic_solve()
+
+    def _init_state(self, masks: array) -> None:
+        # All candidate state lives in one flat array of masks; Cells are views made on demand.
+        self._masks = masks
+        self._rebuild_indexes()
+        self._views = [None] * ix.CELL_COUNT
+        self._queue = collections.deque()
+        self._journal = ChangeJournal()
+
+    @classmethod
+    def from_masks(cls, masks: Iterable[int]) -> "Grid":
+        # Takes the masks as they are, without running any solving on them.
+        masks = array(u.MASK_TYPECODE, masks)
+        if len(masks) != ix.CELL_COUNT:
+            raise ValueError(f'Expected {ix.CELL_COUNT} masks, got {len(masks)}')
+        grid = cls.__new__(cls)
+        grid._init_state(masks)
+        return grid
+
+    @classmethod
+    def from_givens(cls, masks: Iterable[int]) -> "Grid":
+        # Same as building from Cells: every solved cell is propagated to its peers.
+        grid = cls.from_masks(masks)
+        grid._queue_solved()
+        grid._reset_grid_state(had_changes=True)
+        return grid
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Grid":
+        masks = array(u.MASK_TYPECODE)
+        masks.frombytes(data)
+        return cls.from_masks(masks)
+
+    def to_bytes(self) -> bytes:
+        return self._masks.tobytes()
+
+    @property
+    def masks(self) -> array:
+        return array(u.MASK_TYPECODE, self._masks)
+
+    def copy(self) -> "Grid":
+        grid = self.__class__.__new__(self.__class__)
+        grid._masks = array(u.MASK_TYPECODE)
+        grid._positions = array(u.MASK_TYPECODE)
+        grid._views = [None] * ix.CELL_COUNT
+        grid._journal = ChangeJournal()
+        grid.restore(self.snapshot())
+        return grid
+
+    __copy__ = copy
 
     @staticmethod
     def text_to_grid(text: str) -> "Grid":
-        text = text.replace(',', '')
-        text = re.sub(r'\D+', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        text_list = text.split(' ')
-        cell_list = []
-        for i in range(len(text_list)):
-            cell_candidates = []
-            for candidate in text_list[i]:
-                cell_candidates.append(int(candidate))  # Dependent on MAGIC_NUM < 10
-            cell_row = i // c.MAGIC_NUM
-            cell_col = i % c.MAGIC_NUM
-            cell = Cell(*cell_candidates, row=cell_row, column=cell_col)
-            cell_list.append(cell)
-        return Grid(*cell_list)
+        return Grid.from_givens(parser.parse(text))
 
     def __str__(self) -> str:
-        row_divisor = '+------------------------------+------------------------------+------------------------------+'
+        row_divisor = '+' + ('-' * (c.MAGIC_NUM + 1) * ix.BOX_SIZE + '+') * ix.BOX_SIZE
         _temp_list = [row_divisor]
         counter = 0
-        for row in self._rows:
+        masks = self._masks
+        for row in ix.ROWS:
             counter += 1
             row_str = '|'
             cell_counter = 0
-            for cell in row:
+            for i in row:
                 cell_counter += 1
-                candidates = [str(x) for x in cell.candidates]
-                candidates.sort()
-                cell_str = f" {''.join(candidates):<9}"
+                cell_str = f" {u.mask_symbols(masks[i]):<{c.MAGIC_NUM}}"
                 row_str += cell_str
-                if cell_counter == 3:
+                if cell_counter == ix.BOX_SIZE:
                     cell_counter = 0
                     row_str += '|'
             _temp_list.append(row_str)
-            if counter == 3:
+            if counter == ix.BOX_SIZE:
                 counter = 0
                 _temp_list.append(row_divisor)
         return '\n'.join(_temp_list)
 
     def __eq__(self, other) -> bool:
         if isinstance(other, Grid):
-            return str(self) == str(other)
+            return self._masks == other._masks
         elif isinstance(other, str):
             if str(self) == other:
                 return True
@@ -126,148 +176,326 @@ class Grid:
                 return True
             return NotImplemented
 
+    def __hash__(self) -> int:
+        return hash(self._masks.tobytes())
+
     # TODO: look at converting a lot of these lists to tuples.
     def __getitem__(self, i: int, /) -> list[Cell]:
         return self.row(i)
 
+    def _view(self, index: int) -> Cell:
+        cell = self._views[index]
+        if cell is None:
+            cell = self._views[index] = Cell.view(self._masks, index, self)
+        return cell
+
+    def _unit(self, indices: Iterable[int]) -> list[Cell]:
+        views = self._views
+        return [views[i] or self._view(i) for i in indices]
+
     def _cells(self) -> Generator[Cell, None, None]:
-        for row in self._rows:
-            for cell in row:
-                yield cell
+        views = self._views
+        for i in range(ix.CELL_COUNT):
+            yield views[i] or self._view(i)
 
     def cells(self, include_solved: bool = True) -> Generator[Cell, None, None]:
         if include_solved:
             yield from self._cells()
         else:
-            for cell in self._cells():
-                if not cell.solved:
-                    yield cell
+            masks = self._masks
+            for i in range(ix.CELL_COUNT):
+                mask = masks[i]
+                if not mask or mask & (mask - 1):
+                    yield self._views[i] or self._view(i)
 
     def row(self, i: int, /) -> list[Cell]:
-        return self._rows[i].copy()
+        return self._unit(ix.ROWS[i])
 
     def column(self, i: int, /) -> list[Cell]:
-        return self._columns[i].copy()
+        return self._unit(ix.COLUMNS[i])
 
     def box(self, i: int, /) -> list[Cell]:
-        return self._boxes[i].copy()
+        return self._unit(ix.BOXES[i])
 
     def strip(self, i: int, /) -> list[Cell]:
-        cells = []
-        start = i * 3
-        cells.extend(self.row(start))
-        cells.extend(self.row(start + 1))
-        cells.extend(self.row(start + 2))
-        return cells
+        return self._unit(ix.STRIPS[i])
 
     def chute(self, i: int, /) -> list[Cell]:
-        cells = []
-        start = i * 3
-        cells.extend(self.column(start))
-        cells.extend(self.column(start + 1))
-        cells.extend(self.column(start + 2))
-        return cells
+        return self._unit(ix.CHUTES[i])
+
+    def cell_at(self, index: int, /) -> Cell:
+        return self._views[index] or self._view(index)
 
     def visible_from(self, *cells: Cell, include_solved = False) -> list[Cell]:
         cell = cells[-1]
-        cells = cells[:-1]
+        seen = ix.PEER_MASKS[cell.index]
+        for _cell in cells[:-1]:
+            seen &= ix.PEER_MASKS[_cell.index]
+        masks = self._masks
+        views = self._views
         seen_cells = []
-        row = cell.row
-        column = cell.column
-        for _cell in self.row(row):
-            if _cell.column == column:
-                continue
-            seen_cells.append(_cell)
-        for _cell in self.column(column):
-            if _cell.row == row:
-                continue
-            seen_cells.append(_cell)
-        for _cell in self.box(cell.box):
-            if _cell.row == row or _cell.column == column:
-                continue
-            seen_cells.append(_cell)
-        if not include_solved:
-            seen_cells = [x for x in seen_cells if not x.solved]
-        for _cell in cells:
-            seen_cells = [x for x in seen_cells if _cell.sees(x)]
+        for i in ix.PEERS[cell.index]:
+            if seen >> i & 1:
+                mask = masks[i]
+                if include_solved or not mask or mask & (mask - 1):
+                    seen_cells.append(views[i] or self._view(i))
         return seen_cells
 
     def division(self, division: str, position: int | Cell):
         if isinstance(position, Cell):
             position = position.position(division)
-        if division == 'row':
-            return self.row(position)
-        elif division == 'column':
-            return self.column(position)
-        elif division == 'box':
-            return self.box(position)
-        elif division == 'chute':
-            return self.chute(position)
-        elif division == 'strip':
-            return self.strip(position)
-        else:
-            raise TypeError(f'Unknown division {division}')
+        try:
+            indices = ix.DIVISIONS[division][position]
+        except KeyError:
+            raise TypeError(f'Unknown division {division}') from None
+        return self._unit(indices)
 
     def _set_cell(self, cell: Cell) -> None:
-        # I know for now this is mostly unnecessary since Cells are mutable, but I may change that eventually.
-        self._rows[cell.row][cell.column] = cell
-        self._columns[cell.column][cell.row] = cell
-        self._boxes[cell.box][cell.box_cell] = cell
+        if cell.is_view_of(self._masks):
+            return
+        if cell.detached:
+            # A free-standing cell becomes this grid's view of its slot.
+            self.write_mask(cell.index, cell.mask)
+            cell.attach(self._masks, self)
+            self._views[cell.index] = cell
+        else:
+            # Somebody else's view; only take its candidates.
+            self.write_mask(cell.index, cell.mask)
 
     def set_cell(self, cell: Cell) -> None:
         self._set_cell(cell)
-        if cell.solved and not cell.previously_solved:
-            self._basic_solve()
+        self.propagate()
 
-    @_each_division
-    def _basic_solve(self, _cells: Iterable[Cell] = None):
-        # TODO: fix this whole system.
-        values = set()
-        for cell in _cells:
-            if cell.solved:
-                values.add(cell.value)
-        for cell in _cells:
-            for value in values:
-                cell.remove(value)
+    def write_mask(self, index: int, mask: int) -> None:
+        # Every change to a slot goes through here, so newly solved cells get queued for propagation.
+        masks = self._masks
+        old = masks[index]
+        if old == mask:
+            return
+        masks[index] = mask
+        if self._trail is not None:
+            # Search only reads masks; the indexes catch up once it's done.
+            self._trail.append((index, old))
+            if not mask & (mask - 1):
+                self._queue.append(index)
+            return
+        changed = old ^ mask
+        self._journal.record(index, changed)
+        if mask & ~old:
+            self._quiet_units.clear()  # Candidates coming back can undo what any unit was settled on
+        positions = self._positions
+        link_units = self._link_units
+        slots = ix.CELL_POSITION_SLOTS[index]
+        while changed:
+            low = changed & -changed
+            digit_index = low.bit_length() - 1
+            for base, bit, unit_bit in slots:
+                places = positions[base + digit_index] ^ bit
+                positions[base + digit_index] = places
+                # Two places left in the unit is a strong link; anything else isn't (any more).
+                if places.bit_count() == 2:
+                    link_units[digit_index] |= unit_bit
+                else:
+                    link_units[digit_index] &= ~unit_bit
+            changed ^= low
+        old_count = old.bit_count()
+        count = mask.bit_count()
+        if old_count != count or old_count == 2:
+            self._update_registries(index, old, old_count, mask, count)
+        if count == 1:
+            self._queue.append(index)
+
+    def _update_registries(self, index: int, old: int, old_count: int, mask: int, count: int) -> None:
+        bit = 1 << index
+        if old_count == 2:
+            self._bi_value_bits &= ~bit
+            remaining = self._pairs[old] & ~bit
+            if remaining:
+                self._pairs[old] = remaining
+            else:
+                del self._pairs[old]
+        elif old_count == 3:
+            self._tri_value_bits &= ~bit
+        if count == 2:
+            self._bi_value_bits |= bit
+            self._pairs[mask] = self._pairs.get(mask, 0) | bit
+        elif count == 3:
+            self._tri_value_bits |= bit
+
+    def _rebuild_indexes(self) -> None:
+        # positions[unit * MAGIC_NUM + digit - 1] is a mask of where digit can still go in unit.
+        # link_units[digit - 1] is a bitset of the units where that's down to two places, a strong link.
+        # The bi-/tri-value registries are bitsets of cells, with bi-value cells also grouped by their pair.
+        positions = array(u.MASK_TYPECODE, (0,)) * (ix.UNIT_COUNT * c.MAGIC_NUM)
+        link_units = [0] * c.MAGIC_NUM
+        masks = self._masks
+        for unit, indices in enumerate(ix.UNITS):
+            base = unit * c.MAGIC_NUM
+            for place, i in enumerate(indices):
+                for digit_index in ix.bits(masks[i]):
+                    positions[base + digit_index] |= 1 << place
+            for digit_index in range(c.MAGIC_NUM):
+                if positions[base + digit_index].bit_count() == 2:
+                    link_units[digit_index] |= 1 << unit
+        self._positions = positions
+        self._link_units = link_units
+        self._bi_value_bits = 0
+        self._tri_value_bits = 0
+        self._pairs = {}
+        # Per unit search, a bitset of the units it last found nothing in. A unit drops out once the journal
+        # shows it changed, so the search only looks again where something could have moved.
+        self._quiet_units = {}
+        for i, mask in enumerate(masks):
+            count = mask.bit_count()
+            if count == 2 or count == 3:
+                self._update_registries(i, 0, 0, mask, count)
+
+    def digit_positions(self, unit: int, digit: int) -> int:
+        # Bit p is set if the p-th cell of unit (in division order) still has digit as a candidate.
+        return self._positions[unit * c.MAGIC_NUM + digit - 1]
+
+    def digit_cells(self, unit: int, digit: int) -> list[Cell]:
+        indices = ix.UNITS[unit]
+        return [self.cell_at(indices[place]) for place in ix.bits(self._positions[unit * c.MAGIC_NUM + digit - 1])]
+
+    def _candidate_cells(self, digit_index: int) -> int:
+        # Bitset of every cell the digit could still be in, placed or not.
+        positions = self._positions
+        cells = 0
+        for j in range(c.MAGIC_NUM):
+            cells |= positions[(ix.ROW_UNIT + j) * c.MAGIC_NUM + digit_index] << j * c.MAGIC_NUM
+        return cells
+
+    def _removable(self, targets: int, digit_index: int) -> int:
+        # Bitset of the unsolved cells in targets that have the digit.
+        masks = self._masks
+        bit = 1 << digit_index
+        removable = 0
+        for i in ix.bits(targets):
+            if masks[i] & bit and masks[i] != bit:
+                removable |= 1 << i
+        return removable
+
+    def _remove_from(self, targets: int, digit_index: int) -> bool:
+        # Takes the digit out of every unsolved cell in targets that has it.
+        masks = self._masks
+        bit = 1 << digit_index
+        removed = False
+        for i in ix.bits(targets):
+            if masks[i] & bit and masks[i] != bit:
+                cell = self.cell_at(i)
+                cell.remove(digit_index + 1)
                 self.set_cell(cell)
+                removed = True
+        return removed
+
+    def _queue_solved(self) -> None:
+        self._queue.extend(i for i, mask in enumerate(self._masks) if mask and not mask & (mask - 1))
+
+    def propagate(self, hidden_singles: bool = False) -> bool:
+        # Works through the queue of newly solved cells, removing each value from that cell's peers only.
+        # Peers that end up solved join the queue, until nothing is left to do.
+        # Returns False if a contradiction turned up (a cell, or a value in some unit, with nowhere left to go).
+        masks = self._masks
+        queue = self._queue
+        consistent = True
+        while queue:
+            index = queue.popleft()
+            value = masks[index]
+            for peer in ix.PEERS[index]:
+                mask = masks[peer]
+                if not mask & value:
+                    continue
+                if not mask & (mask - 1):
+                    consistent = False  # Peer is already solved with the same value
+                    continue
+                mask &= ~value
+                self.write_mask(peer, mask)
+                if not mask:
+                    consistent = False
+                elif hidden_singles and not self._hidden_singles_around(peer, value):
+                    consistent = False
+            if not consistent:
+                queue.clear()
+                return False
+        return True
+
+    def _hidden_singles_around(self, index: int, removed: int) -> bool:
+        masks = self._masks
+        for unit in ix.CELL_UNITS[index]:
+            place = None
+            for i in ix.UNITS[unit]:
+                if masks[i] & removed:
+                    if place is not None:
+                        break
+                    place = i
+            else:
+                if place is None:
+                    return False
+                mask = masks[place]
+                if mask != removed:
+                    self.write_mask(place, removed)
+        return True
+
+    def snapshot(self) -> "_Snapshot":
+        # Candidate state plus everything derived from it, so restoring never has to rebuild.
+        return _Snapshot(array(u.MASK_TYPECODE, self._masks), array(u.MASK_TYPECODE, self._positions),
+                         tuple(self._link_units), self._bi_value_bits, self._tri_value_bits, dict(self._pairs), tuple(self._queue))
+
+    def restore(self, snapshot: "_Snapshot") -> None:
+        # Arrays are overwritten in place, so existing Cell views see the restored candidates.
+        masks, positions, link_units, bi_value_bits, tri_value_bits, pairs, queue = snapshot
+        self._masks[:] = masks
+        self._positions[:] = positions
+        self._link_units = list(link_units)
+        self._bi_value_bits = bi_value_bits
+        self._tri_value_bits = tri_value_bits
+        self._pairs = dict(pairs)
+        self._queue = collections.deque(queue)
+        self._quiet_units = {}
+        self._journal.checkpoint()
+
+    def _checkpoint(self) -> None:
+        changed = self._journal.units
+        for key, quiet in self._quiet_units.items():
+            self._quiet_units[key] = quiet & ~changed
+        self._journal.checkpoint()
+
+    @property
+    def journal(self) -> ChangeJournal:
+        return self._journal
 
     def _reset_grid_state(self, had_changes: Optional[bool] = False) -> bool:
         # TODO: change default to none (again, trying to keep everything pretty close to how it was before)
         if had_changes is not False:
-            for cell in self.cells():
-                if not had_changes and cell.changed:
-                    had_changes = True
-                cell.reset_changed()
-                self.set_cell(cell)
+            self.propagate()
+            if self._journal:
+                self._checkpoint()
+                return True
             if had_changes:
-                self._clear_cell_collections = True
                 return True
         return False
 
-    def _prep_cell_collections(self) -> None:
-        if self._clear_cell_collections:
-            self._bi_value_cells.clear()
-            self._tri_value_cells.clear()
-            self._strong_links = None
-            for cell in self.cells(include_solved=False):
-                cell_length = len(cell)
-                if cell_length > 3:
-                    continue
-                elif cell_length == 3:
-                    self._tri_value_cells.append(cell)
-                elif cell_length == 2:
-                    self._bi_value_cells.append(cell)
-            self._clear_cell_collections = False
+    def _cells_in(self, bitset: int) -> tuple[Cell, ...]:
+        return tuple(self.cell_at(i) for i in ix.bits(bitset))
 
     @property
-    def bi_value_cells(self) -> list[Cell]:
-        self._prep_cell_collections()
-        return self._bi_value_cells.copy()
+    def bi_value_cells(self) -> tuple[Cell, ...]:
+        return self._cells_in(self._bi_value_bits)
 
     @property
-    def tri_value_cells(self) -> list[Cell]:
-        self._prep_cell_collections()
-        return self._tri_value_cells.copy()
+    def tri_value_cells(self) -> tuple[Cell, ...]:
+        return self._cells_in(self._tri_value_bits)
+
+    @property
+    def bi_value_pairs(self) -> Mapping[int, int]:
+        # Candidate pair mask -> bitset of the cells holding exactly that pair.
+        return MappingProxyType(self._pairs)
+
+    def cells_with_pair(self, pair: int | Iterable[int]) -> tuple[Cell, ...]:
+        if not isinstance(pair, int):
+            pair = u.digits_to_mask(pair)
+        return self._cells_in(self._pairs.get(pair, 0))
 
     @staticmethod
     def cells_by_candidate(*cells: Cell, include_solved: bool = True) -> list[Optional[list[Cell]]]:
@@ -304,45 +532,58 @@ class Grid:
     def are_strongly_linked(self, a: Cell, b: Cell, value: int) -> bool:
         if a.solved or b.solved or value not in a or value not in b:
             return False
-        pair = {a, b}
-        for div_name in {"row", "column", "box"}:
-            if a.aligned(b, div_name):
-                for cell in self.division(div_name, a):
-                    if cell.solved:
-                        continue
-                    if value in cell:
-                        if cell in pair:
-                            continue
-                        break
-                else:
-                    return True
+        link_units = self._link_units[value - 1]
+        for unit in ix.CELL_UNITS[a.index]:
+            if link_units >> unit & 1 and ix.UNIT_MASKS[unit] >> b.index & 1:
+                return True
         return False
 
-    def _find_strong_links(self, candidate: int):
-        if self._strong_links is None:
-            self._strong_links = {}
-        linked_cells = []
-        for i in range(c.MAGIC_NUM):
-            for div in (self.row, self.column, self.box):
-                result = self.find_strong_link(div(i), candidate)
-                if result is None:
-                    continue
-                _a, _b = result
-                if (_a, _b) in linked_cells or (_b, _a) in linked_cells:
-                    continue  # TODO: make find_strong_link return in determined order
-                linked_cells.append((_a, _b))
-        self._strong_links[candidate] = linked_cells
+    def _link(self, unit: int, digit_index: int) -> tuple[int, int] | None:
+        # Cell indices of the strong link for a digit in a unit, in unit order.
+        if not self._link_units[digit_index] >> unit & 1:
+            return None
+        places = self._positions[unit * c.MAGIC_NUM + digit_index]
+        indices = ix.UNITS[unit]
+        first = (places & -places).bit_length() - 1
+        a, b = indices[first], indices[places.bit_length() - 1]
+        masks = self._masks
+        bit = 1 << digit_index
+        if masks[a] == bit or masks[b] == bit:
+            return None  # Already placed, so nothing to link
+        return a, b
+
+    def strong_link(self, unit: int, digit: int) -> tuple[Cell, Cell] | None:
+        link = self._link(unit, digit - 1)
+        if link is None:
+            return None
+        return self.cell_at(link[0]), self.cell_at(link[1])
+
+    def strong_partners(self, cell: Cell, digit: int) -> list[Cell]:
+        # Every cell cell is strongly linked to on digit, through any of its units.
+        partners = []
+        for unit in ix.CELL_UNITS[cell.index]:
+            link = self._link(unit, digit - 1)
+            if link is None:
+                continue
+            other = link[1] if link[0] == cell.index else link[0]
+            if other not in partners:
+                partners.append(other)
+        return [self.cell_at(i) for i in partners]
 
     def find_strong_links(self, candidate: int, sets = False) -> list[tuple[Cell, Cell]] | set[frozenset]:
-        if self._strong_links is None or self._strong_links.get(candidate) is None:
-            self._find_strong_links(candidate)
+        digit_index = candidate - 1
+        linked = []
+        if self._link_units[digit_index]:
+            seen = set()
+            for i in range(c.MAGIC_NUM):
+                for offset in (ix.ROW_UNIT, ix.COLUMN_UNIT, ix.BOX_UNIT):
+                    link = self._link(offset + i, digit_index)
+                    if link is not None and link not in seen:
+                        seen.add(link)  # Pairs come out in unit order, so a repeat is always the same tuple
+                        linked.append(link)
         if sets:
-            linked_cells = set()
-            for link in self._strong_links[candidate]:
-                linked_cells.add(frozenset(link))
-            return linked_cells
-        else:
-            return self._strong_links[candidate].copy()
+            return {frozenset((self.cell_at(a), self.cell_at(b))) for a, b in linked}
+        return [(self.cell_at(a), self.cell_at(b)) for a, b in linked]
 
     @staticmethod  # TODO: turn into *cells
     def find_bi_sets(cells: Iterable[Cell]) -> Generator[list[Cell], None, None]:
@@ -373,11 +614,14 @@ class Grid:
             if 'cells' in new_kwargs:
                 if new_kwargs.pop('cells') is not None: # Remove and check
                     raise ValueError('This decorator should not be used if cells is specified')
+            found = False
             for cells in self.each_division():
                 result = func(*args, **new_kwargs, cells = cells)
                 if result:
-                    return result
-            return False
+                    if not self.apply_all:
+                        return result
+                    found = True
+            return found
         return wrapper
 
     def _orchestrate_transformation(self, func):
@@ -391,148 +635,162 @@ class Grid:
             return result
         return wrapper
 
+    def _candidate_positions(self, cells: list[Cell]) -> tuple[Sequence[int], int]:
+        # For each candidate, a mask of where in cells it can still go, plus a mask of candidates already placed.
+        return self._index_positions([cell.index for cell in cells])
+
+    def _index_positions(self, indices: Sequence[int]) -> tuple[Sequence[int], int]:
+        # Whole units read straight from the position index.
+        masks = self._masks
+        placed = 0
+        for i in indices:
+            mask = masks[i]
+            if mask and not mask & (mask - 1):
+                placed |= mask
+        unit = ix.find_unit(indices)
+        if unit is not None:
+            base = unit * c.MAGIC_NUM
+            return self._positions[base:base + c.MAGIC_NUM], placed
+        positions = [0] * c.MAGIC_NUM
+        for place, i in enumerate(indices):
+            for digit_index in ix.bits(masks[i]):
+                positions[digit_index] |= 1 << place
+        return positions, placed
+
     def _hidden_single_solve(self, cells: Iterable[Cell] = None) -> bool:
-        cell_list = self.cells_by_candidate(*cells, include_solved=False)
-        for i, _cells in enumerate(cell_list):
-            if _cells is None or len(_cells) != 1:
+        cells = list(cells)
+        positions, placed = self._candidate_positions(cells)
+        found = False
+        for i, places in enumerate(positions):
+            if placed >> i & 1 or places.bit_count() != 1:
                 continue
             candidate = i + 1
-            cell = _cells[0]
+            cell = cells[places.bit_length() - 1]
             cell.equals(candidate)
             self.set_cell(cell)
-            return True
-        return False
+            if not self.apply_all:
+                return True
+            found = True
+        return found
 
     def hidden_single_solve(self, cells: Optional[Iterable[Cell]] = None) -> bool:
         return self._orchestrate_transformation(self._hidden_single_solve)(cells=cells)
 
-    def _hidden_pairs_solve(self, cells: Iterable[Cell] = None) -> bool:
-        cell_list = self.cells_by_candidate(*cells, include_solved=False)
-        interesting_candidates = []
-        for i, _cells in enumerate(cell_list):
-            candidate = i + 1
-            if _cells is None or len(_cells) != 2:
-                continue
-            if all(len(cell) == 2 for cell in _cells):
-                continue # Naked pair
-            interesting_candidates.append(candidate)
-        for x, y in itertools.combinations(interesting_candidates, 2):
-            if set(cell_list[x - 1]) != set(cell_list[y - 1]):
-                continue
-            eligible_cells = [x for x in cell_list[x-1] if len(x) != 2]
-            if not eligible_cells:
-                raise ValueError('Unexpected-- no eligible cells yet already screened out naked pairs')
-            for cell in eligible_cells:
-                cell.candidates = [x, y]
-                self.set_cell(cell)
-            return True
-        return False
+    def _subsets_solve(self, solve, set_size: int, cells: Optional[Iterable[Cell]]) -> bool:
+        # Given cells are one group; otherwise every unit in turn, straight off the indices.
+        if cells is not None:
+            result = solve(set_size, [cell.index for cell in cells])
+        else:
+            result = False
+            key = (solve.__name__, set_size)
+            quiet = self._quiet_units.get(key, 0) & ~self._journal.units
+            for unit in range(ix.UNIT_COUNT):
+                if quiet >> unit & 1:
+                    continue
+                if solve(set_size, ix.UNITS[unit]):
+                    result = True
+                    if not self.apply_all:
+                        break
+                else:
+                    quiet |= 1 << unit
+            self._quiet_units[key] = quiet  # Whatever this pass changed drops out at the checkpoint
+        self._reset_grid_state(had_changes=result)
+        return result
+
+    def _hidden_sets(self, set_size: int, indices: Sequence[int], _every = False) -> bool:
+        # set_size candidates with only set_size places between them fill those cells, so nothing else can.
+        positions, placed = self._index_positions(indices)
+        places_by_digit = [0 if placed >> i & 1 else places for i, places in enumerate(positions)]
+        masks = self._masks
+        found = False
+        for digits, places in u.subsets(places_by_digit, set_size):
+            removed = False
+            for place in ix.bits(places):
+                i = indices[place]
+                if masks[i] & ~digits:
+                    cell = self.cell_at(i)
+                    cell.set_mask(cell.mask & digits)
+                    self.set_cell(cell)
+                    removed = True
+            if removed:
+                if not (self.apply_all or _every):
+                    return True
+                found = True
+        return found
 
     def hidden_pairs_solve(self, cells: Optional[Iterable[Cell]] = None) -> bool:
-        return self._orchestrate_transformation(self._hidden_pairs_solve)(cells=cells)
-
-    def _naked_sets_solve(self, set_size : int, cells: Iterable[Cell] = None) -> bool:
-        interesting_cells = []
-        for cell in cells:
-            if cell.solved:
-                continue
-            if len(cell) > set_size:
-                continue
-            interesting_cells.append(cell)
-        for cell_combo in itertools.combinations(interesting_cells, set_size):
-            candidate_set = set()
-            for cell in cell_combo:
-                candidate_set.update(cell.candidates)
-            if len(candidate_set) != set_size:
-                continue
-            eligible_cells = [x for x in self.visible_from(*cell_combo) if x.intersection(candidate_set)]
-            if eligible_cells:
-                for cell in eligible_cells:
-                    cell.remove(candidate_set)
+        return self._subsets_solve(self._hidden_sets, 2, cells)
+
+    def _naked_sets(self, set_size: int, indices: Sequence[int]) -> bool:
+        masks = self._masks
+        # Solved cells are never part of a set.
+        cell_masks = [mask if mask & (mask - 1) else 0 for mask in map(masks.__getitem__, indices)]
+        found = False
+        for places, candidate_mask in u.subsets(cell_masks, set_size):
+            removed = False
+            for i in ix.bits(ix.common_peers(*(indices[place] for place in ix.bits(places)))):
+                mask = masks[i]
+                if mask & candidate_mask and mask & (mask - 1):
+                    cell = self.cell_at(i)
+                    cell.remove_mask(candidate_mask)
                     self.set_cell(cell)
-                return True
-        return False
+                    removed = True
+            if removed:
+                if not self.apply_all:
+                    return True
+                found = True
+        return found
 
     def pairs_solve(self, cells: Optional[Iterable[Cell]] = None) -> bool:
-        return self._orchestrate_transformation(self._naked_sets_solve)(set_size = 2, cells=cells)
+        return self._subsets_solve(self._naked_sets, 2, cells)
 
     def triples_solve(self, cells: Optional[Iterable[Cell]] = None) -> bool:
-        return self._orchestrate_transformation(self._naked_sets_solve)(set_size = 3, cells=cells)
+        return self._subsets_solve(self._naked_sets, 3, cells)
 
     def quads_solve(self, cells: Optional[Iterable[Cell]] = None) -> bool:
-        return self._orchestrate_transformation(self._naked_sets_solve)(set_size = 4, cells=cells)
+        return self._subsets_solve(self._naked_sets, 4, cells)
 
     @_transformation
     def intersection_removal(self):
-        for div_name, other_divisions in {('row', ('box',))  # Box Line reduction
-            , ('column', ('box',))  # Box Line reduction
-            , ('box', ('row', 'column'))  # Pointing pairs /triples
-                                          }:  # TODO: refactor so constant order, and have pointing pairs go first
+        for div_name, other_divisions in (('row', ('box',))  # Box Line reduction
+                                          , ('column', ('box',))  # Box Line reduction
+                                          , ('box', ('row', 'column'))):  # Pointing pairs /triples
+            # TODO: have pointing pairs go first
             for i in range(c.MAGIC_NUM):
-                _div_cells = self.division(div_name, i)
-                _values = list([] for _ in c.VALID_CANDIDATES)  # TODO
-                for cell in _div_cells:
-                    if cell.solved:
-                        _values[cell.value - 1] = None
-                    else:
-                        for val in cell.candidates:
-                            _values[val - 1].append(cell)
-                            # TODO: Make a function that does this. Have WAY too many functions that do this.
+                unit = ix.unit_id(div_name, i)
+                unit_cells = ix.UNITS[unit]
+                _values, placed = self._candidate_positions(self.division(div_name, i))
                 for j in range(c.MAGIC_NUM):
                     candidate = j + 1
-                    cells = _values[j]
-                    if cells is None:
+                    places = _values[j]
+                    if placed >> j & 1:
                         continue
-                    if len(cells) > 3:
+                    if places.bit_count() > 3:
                         continue
+                    cells = [unit_cells[place] for place in ix.bits(places)]
                     for other_div in other_divisions:
-                        _which_spots = set(cell.position(other_div) for cell in cells)
+                        position_of = ix.POSITION_OF[other_div]
+                        _which_spots = set(position_of[x] for x in cells)
                         if len(_which_spots) != 1:  # THe linked cells from div_name aren't all in other_category as well.
                             continue  # So keep moving.
                         _pos = _which_spots.pop()  # All of them were in one other category, _pos.
                         for _other_cell in self.division(other_div, _pos):
-                            for cell in cells:  # TODO: FIX
-                                if cell == _other_cell:
-                                    break  # Is one of the original cells, leave alone
-                            else:
-                                _other_cell.remove(candidate)
-                                self.set_cell(_other_cell)
+                            if _other_cell.index in cells:
+                                continue  # Is one of the original cells, leave alone
+                            _other_cell.remove(candidate)
+                            self.set_cell(_other_cell)
 
     @_transformation
-    @_each_division  # TODO: what?
-    def hidden_sets(self, count, _cells: Iterable[Cell] = None):
-        cells_by_candidate = [[] for _ in c.VALID_CANDIDATES]
-        for cell in _cells:
-            if cell.solved:
-                cells_by_candidate[cell.value - 1] = None
-            else:
-                for candidate in cell:
-                    cells_by_candidate[candidate - 1].append(cell)
-        uninteresting_candidates = []
-        for i in range(len(cells_by_candidate)):
-            candidate = i + 1
-            cells_with_candidates = cells_by_candidate[i]
-            if cells_with_candidates is None or len(cells_with_candidates) > count:
-                uninteresting_candidates.append(candidate)
-        interesting_candidates = set(c.VALID_CANDIDATES) - set(uninteresting_candidates)
-        for combination in itertools.combinations(interesting_candidates, count):
-            _temp_cell_holding = None
-            for candidate in combination:
-                index = candidate - 1
-                if _temp_cell_holding is None:
-                    _temp_cell_holding = []
-                for cell in cells_by_candidate[index]:
-                    if cell not in _temp_cell_holding:
-                        _temp_cell_holding.append(cell)
-            if len(_temp_cell_holding) == count:
-                extra_candidates = c.VALID_CANDIDATES - set(combination)
-                for cell in _temp_cell_holding:
-                    cell.remove(extra_candidates)
-                    self.set_cell(cell)
+    @_each_division
+    def hidden_sets(self, count, _unit: int = None):
+        # Every hidden set in every unit goes in one call, even stepping.
+        self._hidden_sets(count, ix.UNITS[_unit], _every=True)
 
     @_transformation
     def chute_remote_pairs(self):
-        for i in range(3):  # TODO: SWap
+        if ix.BOX_SIZE != 3:
+            return False  # Needs exactly one box in the chute that neither pair cell is in.
+        for i in range(ix.BOX_SIZE):  # TODO: SWap
             for _div in {'chute', 'strip'}:
                 if _div == 'chute':
                     _sub_div = 'column'
@@ -543,6 +801,8 @@ class Grid:
                     for cell_a, cell_b in itertools.combinations(bi_valued_cells, 2):
                         if cell_a.sees(cell_b):
                             continue
+                        if cell_a.mask != cell_b.mask or len(cell_a) != 2:
+                            continue  # An earlier elimination in this pass changed the pair
                         unseen_cells = []
                         double_elimination_cells = []
                         double_seen_cells = []
@@ -580,7 +840,8 @@ class Grid:
                             for cell in eligible_cells:
                                 cell.remove(candidate)
                                 self.set_cell(cell)
-                            return None  # TODO: CLEAN up
+                            if not self.apply_all:
+                                return None  # TODO: CLEAN up
                         elif count_seen == 0:
                             eligible_cells = [_x for _x in double_elimination_cells if
                                               not _x.solved and _x.intersection(cell_a)]
@@ -589,13 +850,14 @@ class Grid:
                             for cell in eligible_cells:
                                 cell.remove(cell_a.candidates)
                                 self.set_cell(cell)
-                            return None
+                            if not self.apply_all:
+                                return None
                         else:
                             raise ValueError('Saw a weird number of candidates, what?')
         return None
 
-    def _rectangle_elimination(self, candidate: int = None, _cells: Iterable[Cell] = None, other_div: str = None):
-        temp = self.find_strong_link(_cells, candidate)
+    def _rectangle_elimination(self, candidate: int = None, _unit: int = None, other_div: str = None):
+        temp = self.strong_link(_unit, candidate)
         if temp is None or temp[0].box == temp[1].box:  # TODO: use aligned
             return None
 
@@ -609,9 +871,9 @@ class Grid:
                     continue
                 if candidate in wing_2:
                     relevant_box = (
-                                               wing_2.strip * 3) + wing_1.chute  # TODO: make Cell static method for this sort of thing
+                                               wing_2.strip * ix.BOX_SIZE) + wing_1.chute  # TODO: make Cell static method for this sort of thing
                     if relevant_box == hinge.box:
-                        relevant_box = (wing_1.strip * 3) + wing_2.chute
+                        relevant_box = (wing_1.strip * ix.BOX_SIZE) + wing_2.chute
                     box_cells = self.box(relevant_box)
                     for box_cell in box_cells:
                         if candidate not in box_cell:
@@ -623,95 +885,118 @@ class Grid:
                         # Candidate would go entirely missing from the relevant box if cell == candidate.
                         wing_2.remove(candidate)
                         self.set_cell(wing_2)
-                        return True
+                        if not self.apply_all:
+                            return True
 
     @_transformation
     def rectangle_elimination(self):
         for candidate in c.VALID_CANDIDATES:
-            for division, other_div in {(self.row, 'column'), (self.column, 'row')}:
+            for division, other_div in (('row', 'column'), ('column', 'row')):
                 for __i in range(c.MAGIC_NUM):
-                    _cells = division(__i)
-                    res = self._rectangle_elimination(candidate=candidate, _cells=_cells, other_div=other_div)
+                    res = self._rectangle_elimination(candidate=candidate, _unit=ix.unit_id(division, __i),
+                                                      other_div=other_div)
                     if res is True:
                         return True
         return None
 
+    def _wing_pincers(self, pivot: int, first: int, second: int) -> Generator[tuple[int, int], None, None]:
+        # Every pair of bivalue peers of pivot, one holding exactly the candidates in first, the other second.
+        peers = ix.PEER_MASKS[pivot]
+        pairs = self._pairs
+        seconds = pairs.get(second, 0) & peers
+        if not seconds:
+            return
+        for a in ix.bits(pairs.get(first, 0) & peers):
+            for b in ix.bits(seconds):
+                yield a, b
+
     @_transformation
     def y_wing(self):
-        def _single_intersection(*args: Cell):
-            for _a, _b in itertools.combinations(args, 2):
-                if len(_a.intersection(_b)) != 1:
-                    return False
-            return True
+        # A bivalue pivot xy, seeing bivalue pincers xz and yz: whichever of x and y the pivot holds,
+        # one pincer is z, so cells seeing both pincers can't be.
+        # Step mode takes the wing the triple by triple scan always met first: lowest three cells, then the
+        # earliest of them as pivot.
+        masks = self._masks
+        holding = [self._candidate_cells(digit_index) for digit_index in range(c.MAGIC_NUM)]
+        found = False
+        first = None
+        for pivot in ix.bits(self._bi_value_bits):
+            pivot_mask = masks[pivot]
+            if pivot_mask.bit_count() != 2:
+                continue  # Solved earlier in this pass
+            x, y = pivot_mask & -pivot_mask, pivot_mask & (pivot_mask - 1)
+            for digit_index in ix.bits(c.FULL_MASK & ~pivot_mask):
+                z = 1 << digit_index
+                for a, b in self._wing_pincers(pivot, x | z, y | z):
+                    targets = ix.common_peers(a, b) & holding[digit_index]
+                    if self.apply_all:
+                        found |= self._remove_from(targets, digit_index)
+                    elif self._removable(targets, digit_index):
+                        cells = sorted((pivot, a, b))
+                        key = cells, cells.index(pivot)
+                        if first is None or key < first[0]:
+                            first = key, targets, digit_index
+        if first is not None:
+            return self._remove_from(*first[1:])
+        return found
 
-        for cell_a, cell_b, cell_c in itertools.combinations(self.bi_value_cells, 3):
-            candidates = cell_a.union(cell_b.union(cell_c))
-            if len(candidates) != 3:
-                continue
-            if not _single_intersection(cell_a, cell_b, cell_c):
-                continue
-            if not cell_a.sees(cell_b) and not cell_a.sees(cell_c):  # TODO; fix
+    @_transformation
+    def xyz_wing(self):
+        # The same with a trivalue pivot xyz, so the pivot can be z as well: only cells seeing all three lose it.
+        # Step mode takes the first pivot's lowest pair of pincers, as the pivot by pivot scan always did.
+        masks = self._masks
+        holding = [self._candidate_cells(digit_index) for digit_index in range(c.MAGIC_NUM)]
+        found = False
+        for pivot in ix.bits(self._tri_value_bits):
+            pivot_mask = masks[pivot]
+            if pivot_mask.bit_count() != 3:
                 continue
-            for hinge, wing_1, wing_2 in itertools.permutations([cell_a, cell_b, cell_c]):
-                if not (hinge.sees(wing_1) and hinge.sees(wing_2)):
-                    continue
-                common_candidate = wing_1.intersection(wing_2)
-                if len(common_candidate) != 1:
-                    raise ValueError('Should be impossible to get here')
-                common_candidate = common_candidate.pop()
-                affected_cells = []
-                for cell in self.visible_from(wing_1):
-                    if common_candidate not in cell.candidates:
-                        continue
-                    if cell in [hinge, wing_2]:
-                        continue
-                    if cell.sees(wing_2):
-                        affected_cells.append(cell)
-                if not affected_cells:
-                    continue
-                for cell in affected_cells:
-                    cell.remove(common_candidate)
-                    self.set_cell(cell)
-                return None  # Cells were modified, exit
-        return None
+            first = None
+            for digit_index in ix.bits(pivot_mask):
+                z = 1 << digit_index
+                rest = pivot_mask & ~z
+                x, y = rest & -rest, rest & (rest - 1)
+                for a, b in self._wing_pincers(pivot, x | z, y | z):
+                    if any(ix.UNIT_MASKS[unit] >> a & ix.UNIT_MASKS[unit] >> b & 1 for unit in ix.CELL_UNITS[pivot]):
+                        continue  # All in one unit is a naked triple
+                    targets = ix.common_peers(pivot, a, b) & holding[digit_index]
+                    if self.apply_all:
+                        found |= self._remove_from(targets, digit_index)
+                    elif self._removable(targets, digit_index):
+                        key = min(a, b), max(a, b)
+                        if first is None or key < first[0]:
+                            first = key, targets, digit_index
+            if first is not None:
+                return self._remove_from(*first[1:])
+        return found
 
     @_transformation
-    def xyz_wing(self):
-        for triad in self.tri_value_cells:
-            triad_candidates = triad.candidates
-            visible_cells = self.visible_from(triad)
-            valid_bi_values = []
-            for bi in self.bi_value_cells:
-                if triad.sees(bi):
-                    if bi.candidates.issubset(triad_candidates):
-                        valid_bi_values.append(bi)
-            if len(valid_bi_values) < 2:
+    def w_wing(self):
+        # Two bivalue xy cells that don't see each other, joined by a strong link on x (each sees one end):
+        # if one isn't y it's x, so its end of the link isn't, the other end is, and so the other cell is y.
+        holding = [self._candidate_cells(digit_index) for digit_index in range(c.MAGIC_NUM)]
+        found = False
+        for pair, cells in list(self._pairs.items()):
+            if cells.bit_count() < 2:
                 continue
-            for combo in itertools.combinations(valid_bi_values, 2):
-                cell_a, cell_b = combo
-                if cell_a.row == cell_b.row == triad.row:
-                    continue  # TODO: fix this
-                if cell_a.column == cell_b.column == triad.column:
-                    continue
-                if cell_a.box == cell_b.box == triad.box:
-                    continue
-                in_common = cell_a.intersection(cell_b)
-                if len(in_common) != 1:
-                    continue
-                common_candidate = in_common.pop()
-                affected_cells = []
-                for cell in visible_cells:
-                    if common_candidate not in cell:
+            for link_index in ix.bits(pair):
+                digit_index = (pair & ~(1 << link_index)).bit_length() - 1
+                for unit in ix.bits(self._link_units[link_index]):
+                    link = self._link(unit, link_index)
+                    if link is None:
                         continue
-                    if cell.sees(cell_a) and cell.sees(cell_b):
-                        affected_cells.append(cell)
-                if not affected_cells:
-                    continue
-                for cell in affected_cells:
-                    cell.remove(common_candidate)
-                    self.set_cell(cell)
-                return None
-        return None
+                    a, b = link
+                    ends = 1 << a | 1 << b
+                    for first in ix.bits(cells & ix.PEER_MASKS[a] & ~ends):
+                        for second in ix.bits(cells & ix.PEER_MASKS[b] & ~ends & ~(1 << first)):
+                            if ix.PEER_MASKS[first] >> second & 1:
+                                continue  # Just a naked pair
+                            targets = ix.common_peers(first, second) & holding[digit_index]
+                            if self._remove_from(targets, digit_index):
+                                if not self.apply_all:
+                                    return True
+                                found = True
+        return found
 
     @_transformation
     def bug_squasher(self):
@@ -739,479 +1024,585 @@ class Grid:
                 return None
         return None
 
+    def _xy_graph(self) -> dict[tuple[int, int], tuple[tuple[tuple[int, int], int], ...]]:
+        # Nodes are (bivalue cell, bit of the digit it holds), each with the nodes it forces and the digit
+        # linking them. From a cell holding v, a peer with v in it can't hold v, so holds its other digit
+        # (weak link); and the digit the cell doesn't hold goes to any bivalue strong link partner on it.
+        # Candidates only ever go, so every link stays sound for the rest of a pass.
+        masks = self._masks
+        bi_values = self._bi_value_bits
+        partners = [self._strong_partners(digit_index) for digit_index in range(c.MAGIC_NUM)]
+        graph = {}
+        for i in ix.bits(bi_values):
+            mask = masks[i]
+            for on in (mask & -mask, mask & (mask - 1)):
+                off = mask & ~on
+                following = [((j, masks[j] & ~on), on) for j in ix.bits(ix.PEER_MASKS[i] & bi_values)
+                             if masks[j] & on]
+                for j in ix.bits(partners[off.bit_length() - 1].get(i, 0) & bi_values):
+                    if not masks[j] & on:
+                        following.append(((j, off), off))
+                graph[i, on] = tuple(following)
+        return graph
+
     @staticmethod
-    def chaining(*chain_nodes: Cell, length = 1, final_cell: Cell = None, max_length = 10, cells = None):
-        prior_cell = chain_nodes[-1]
-        if prior_cell == final_cell:
-            if length >= 3:
-                yield chain_nodes
-            else:  # TODO: Combo
-                return
-        elif length >= max_length:
-            return
-        elif not cells:
-            return
-        else:
-            temp = [x for x in cells if x.inclusive_sees(prior_cell) and x.intersection(prior_cell)]
-            for cell in temp:
-                # TODO: add in strong/weak loop logic?
-                _cells = cells[:]
-                _cells.remove(cell)
-                yield from Grid.chaining(*chain_nodes, cell, length=length + 1, final_cell=final_cell,
-                                         max_length=max_length, cells=_cells)
-
-    def _closed_xy_chain(self, max_chain, valid_bookends):
-        for fl_pair, eligible_remaining in valid_bookends.items():
-            first_cell, final_cell = fl_pair
-            eligible_cells, remaining_cells = eligible_remaining
-            for chain in self.chaining(first_cell, final_cell=final_cell, max_length=max_chain, cells=remaining_cells):
-                for candidate in first_cell.intersection(final_cell):
-                    _eligible_cells = [x for x in eligible_cells if candidate in x and x not in chain]
-                    if not _eligible_cells:
-                        continue  # TODO: remove and check elsewhere? idk
-                    other_candidate = (first_cell.candidates - {candidate}).pop()
-                    on_value, off_value = other_candidate, candidate
-                    cell_b = first_cell
-                    i = 1
-                    candidate_removals = [(candidate, _eligible_cells)]
-                    remaining = [x for x in self.cells(include_solved=False) if x not in chain]
-                    while i < len(chain):
-                        cell_a, cell_b = cell_b, chain[i]
-                        if on_value in cell_b:
-                            # Weak link between cell_a and cell_b  via on_value
-                            _cells = [x for x in remaining if
-                                      on_value in x and x.inclusive_sees(cell_a) and x.inclusive_sees(cell_b)]
-                            if _cells:
-                                candidate_removals.append((on_value, _cells))
-                            off_value = on_value
-                            on_value = (cell_b.candidates - {off_value}).pop()
-                        elif off_value in cell_b and self.are_strongly_linked(cell_a, cell_b, off_value):
-                            # TODO: skip link here? should be unnecessary due to intersection removal
-                            _cells = [x for x in remaining if
-                                      off_value in x and x.inclusive_sees(cell_a) and x.inclusive_sees(cell_b)]
-                            if _cells:
-                                candidate_removals.append((off_value, _cells))
-                            on_value = off_value
-                            off_value = (cell_b.candidates - {on_value}).pop()
-                        else:
-                            on_value = None
-                            break
-                        i += 1
-                    if on_value is None or on_value != candidate or cell_b != final_cell:
-                        continue
-                    for _candidate, _eligible_cells in candidate_removals:
-                        for cell in _eligible_cells:
-                            cell.remove(_candidate)
-                            self.set_cell(cell)
-                    return True
-        return None
+    def _xy_chain_ends(graph: dict[tuple[int, int], tuple[tuple[tuple[int, int], int], ...]], start: tuple[int, int],
+                       max_chain: int, barred: int = 0) -> dict[tuple[int, int], Optional[tuple[tuple[int, int], int]]]:
+        # Breadth first from start, each node visited once. Node -> (the node it was reached from, linking digit),
+        # in the order they were reached, for chains of up to max_chain cells. Cells in barred can't follow
+        # start directly, only further along.
+        parents = {start: None}
+        frontier = [start]
+        for _ in range(max_chain - 1):
+            reached = []
+            for node in frontier:
+                for following, link in graph[node]:
+                    if following not in parents and not (node == start and barred >> following[0] & 1):
+                        parents[following] = node, link
+                        reached.append(following)
+            if not reached:
+                break
+            frontier = reached
+        return parents
 
     @_transformation
     def xy_chain(self, _max_chain: Optional[int] = None):
-        bi_values = self.bi_value_cells
-        many_bis = len(bi_values)
+        # Starting from "first doesn't hold x", any chain ending at a cell that does hold x means one of the two
+        # does, so cells seeing both can't. When first and final see each other as well, the chain is a loop:
+        # every link's digit is in exactly one of its two cells, and cells seeing both of those lose it too.
+        many_bis = self._bi_value_bits.bit_count()
         if many_bis < 3:
             return None
         if _max_chain is None:
             _max_chain = many_bis
         else:
             _max_chain = min(_max_chain, many_bis)
+        masks = self._masks
+        graph = self._xy_graph()
+        for first in ix.bits(self._bi_value_bits):
+            first_mask = masks[first]
+            if first_mask.bit_count() != 2:
+                continue  # Solved earlier in this pass
+            for x in (first_mask & -first_mask, first_mask & (first_mask - 1)):
+                start = first, first_mask & ~x
+                # A chain needs three different cells. Those start reaches in one step holding x would only ever
+                # be that step away, so chains ending on each of them come from a search of their own.
+                direct = 0
+                for (i, on), _ in graph[start]:
+                    if on == x:
+                        direct |= 1 << i
+                searches = [(self._xy_chain_ends(graph, start, _max_chain), ~direct)]
+                for i in ix.bits(direct):
+                    searches.append((self._xy_chain_ends(graph, start, _max_chain, 1 << i), 1 << i))
+                for parents, finals in searches:
+                    for final, on in parents:
+                        if on != x or final == first or not finals >> final & 1:
+                            continue
+                        in_chain = 1 << final
+                        links = []
+                        node = parents[final, on]
+                        while node is not None:
+                            (i, _), link = node
+                            in_chain |= 1 << i
+                            links.append((link, i))
+                            node = parents[node[0]]
+                        if in_chain.bit_count() != len(links) + 1:
+                            continue  # Comes back through a cell
+                        removals = [(x, first, final)]
+                        if ix.PEER_MASKS[first] >> final & 1:
+                            following = final
+                            for link, i in links:
+                                removals.append((link, i, following))
+                                following = i
+                        removed = False
+                        for bit, a, b in removals:
+                            for i in ix.bits(ix.common_peers(a, b) & ~in_chain):
+                                if masks[i] & bit and masks[i] != bit:
+                                    cell = self.cell_at(i)
+                                    cell.remove(bit.bit_length())
+                                    self.set_cell(cell)
+                                    removed = True
+                        if removed and not self.apply_all:
+                            return None
+        return None
 
-        valid_bookends, valid_seen_bookends = {}, {}
-        for pair in itertools.combinations(bi_values, 2):
-            a, b = pair
-            candidate_intersection = a.intersection(b)
-            if not candidate_intersection:
+    def _rectangles(self, holding: Sequence[int],
+                    least: int) -> Generator[tuple[tuple[int, int, int, int], int], None, None]:
+        # Rectangles from the index with at least least corners down to a pair, and the rest still holding
+        # both its digits, with that pair. Unique puzzles can't have all four corners down to the pair:
+        # the two digits could swap.
+        for pair, cells in sorted(self._pairs.items()):
+            if cells.bit_count() < least:
                 continue
-            eligible_cells = self.visible_from(a)
-            eligible_cells = [x for x in eligible_cells if x.intersection(candidate_intersection) and b.sees(x)]
-            if not eligible_cells:
+            low = pair & -pair
+            both = holding[low.bit_length() - 1] & holding[(pair ^ low).bit_length() - 1]
+            seen = set()
+            for i in ix.bits(cells):
+                for r in ix.CELL_RECTANGLES[i]:
+                    rectangle = ix.RECTANGLE_MASKS[r]
+                    if r not in seen and not rectangle & ~both and (rectangle & cells).bit_count() >= least:
+                        seen.add(r)
+                        yield ix.RECTANGLES[r], pair
+
+    def _strip(self, i: int, mask: int) -> bool:
+        # Takes the candidates in mask out of cell i, as long as it keeps some.
+        old = self._masks[i]
+        if not old & mask or not old & ~mask:
+            return False
+        cell = self.cell_at(i)
+        cell.remove_mask(mask)
+        self.set_cell(cell)
+        return True
+
+    def _linked(self, a: int, b: int, digit_index: int) -> bool:
+        # a and b are the only places for the digit in some unit they share.
+        link_units = self._link_units[digit_index]
+        return any(link_units >> unit & 1 and ix.UNIT_MASKS[unit] >> b & 1 for unit in ix.CELL_UNITS[a])
+
+    def _ur_type1(self, corners, pair, roof, holding) -> bool:
+        # Three corners down to the pair: the fourth can't be either.
+        return len(roof) == 1 and self._strip(corners[roof[0]], pair)
+
+    def _ur_type2(self, corners, pair, roof, holding) -> bool:
+        # Every other corner has the same one extra candidate (types 2 and 5): one of them is it.
+        masks = self._masks
+        extra = masks[corners[roof[0]]] & ~pair
+        if len(roof) < 2 or extra.bit_count() != 1 or any(masks[corners[k]] != pair | extra for k in roof):
+            return False
+        digit_index = extra.bit_length() - 1
+        return self._remove_from(ix.common_peers(*(corners[k] for k in roof)) & holding[digit_index], digit_index)
+
+    @staticmethod
+    def _roof(roof) -> Optional[tuple[int, int]]:
+        # The two corners with extras, when they share a row or column (and so do the two pair cells).
+        if len(roof) != 2 or roof[0] + roof[1] == 3:
+            return None
+        return roof[0], roof[1]
+
+    def _ur_type3(self, corners, pair, roof, holding) -> bool:
+        # The roof's extra candidates act as one more cell in a unit both roof corners share: a naked set
+        # with it takes its digits from the rest of the unit.
+        sides = self._roof(roof)
+        if sides is None:
+            return False
+        masks = self._masks
+        a, b = corners[sides[0]], corners[sides[1]]
+        extra = (masks[a] | masks[b]) & ~pair
+        found = False
+        for unit in set(ix.CELL_UNITS[a]) & set(ix.CELL_UNITS[b]):
+            others = [i for i in ix.UNITS[unit] if i != a and i != b and masks[i] & (masks[i] - 1)]
+            for size in range(max(2, extra.bit_count()), 5):
+                for chosen, digits in u.subsets([extra] + [masks[i] for i in others], size):
+                    if not chosen & 1:
+                        continue  # A plain naked set
+                    keep = 1 << a | 1 << b
+                    for place in ix.bits(chosen >> 1):
+                        keep |= 1 << others[place]
+                    for digit_index in ix.bits(digits):
+                        if self._remove_from(ix.UNIT_MASKS[unit] & ~keep & holding[digit_index], digit_index):
+                            found = True
+                    if found and not self.apply_all:
+                        return True
+        return found
+
+    def _ur_type4(self, corners, pair, roof, holding) -> bool:
+        # One of the pair is strongly linked across the roof, so the roof holds it: the other digit goes from both.
+        sides = self._roof(roof)
+        if sides is None:
+            return False
+        a, b = corners[sides[0]], corners[sides[1]]
+        for digit_index in ix.bits(pair):
+            if self._linked(a, b, digit_index):
+                other = pair & ~(1 << digit_index)
+                stripped = self._strip(a, other)
+                return self._strip(b, other) or stripped
+        return False
+
+    def _ur_type6(self, corners, pair, roof, holding) -> bool:
+        # The pair cells face each other, and one digit is in only the corners of both rows and both columns:
+        # it has to go in the pair cells, so not the others.
+        if len(roof) != 2 or roof[0] + roof[1] != 3:
+            return False
+        link_units = self._link_units
+        lines = [ix.ROW_UNIT + ix.ROW_OF[corners[0]], ix.ROW_UNIT + ix.ROW_OF[corners[3]],
+                 ix.COLUMN_UNIT + ix.COLUMN_OF[corners[0]], ix.COLUMN_UNIT + ix.COLUMN_OF[corners[3]]]
+        for digit_index in ix.bits(pair):
+            if all(link_units[digit_index] >> unit & 1 for unit in lines):
+                stripped = self._strip(corners[roof[0]], 1 << digit_index)
+                return self._strip(corners[roof[1]], 1 << digit_index) or stripped
+        return False
+
+    def _ur_hidden(self, corners, pair, roof, holding) -> bool:
+        # Facing a pair cell, a corner linked on one digit to both its neighbours can't be the other digit.
+        masks = self._masks
+        for k in range(4):
+            if masks[corners[k]] != pair:
                 continue
-            remaining_cells = [x for x in bi_values if x != a]
-            if a.inclusive_sees(b):
-                valid_seen_bookends[(a, b)] = (eligible_cells, remaining_cells)
-            else:
-                valid_bookends[(a, b)] = (eligible_cells, remaining_cells)
-
-        found = self._closed_xy_chain(max_chain=_max_chain, valid_bookends=valid_seen_bookends)
-        if found:
-            return True
-        for fl_pair, eligible_remaining in valid_bookends.items():
-            first_cell, final_cell = fl_pair
-            eligible_cells, remaining_cells = eligible_remaining
-            for chain in self.chaining(first_cell, final_cell=final_cell, max_length=_max_chain, cells=remaining_cells):
-                for candidate in first_cell.intersection(final_cell):
-                    _eligible_cells = [x for x in eligible_cells if candidate in x and x not in chain]
-                    if not _eligible_cells:
-                        continue
-                    other_candidate = (first_cell.candidates - {candidate}).pop()
-                    on_value, off_value = other_candidate, candidate
-                    cell_b = first_cell
-                    i = 1
-                    while i < len(chain):
-                        cell_a, cell_b = cell_b, chain[i]
-                        if on_value in cell_b:
-                            off_value = on_value
-                            on_value = (cell_b.candidates - {off_value}).pop()
-                        elif off_value in cell_b and self.are_strongly_linked(cell_a, cell_b, off_value):
-                            on_value = off_value
-                            off_value = (cell_b.candidates - {on_value}).pop()
-                        else:
-                            on_value = None
-                            break
-                        i += 1
-                    if on_value is None or on_value != candidate or cell_b != final_cell:
-                        continue
-                    for cell in _eligible_cells:
-                        cell.remove(candidate)
-                        self.set_cell(cell)
-                    return None
-        return None
+            far = 3 - k
+            cell = corners[far]
+            for digit_index in ix.bits(pair):
+                if not self._linked(cell, corners[far ^ 1], digit_index):
+                    continue
+                if self._linked(cell, corners[far ^ 2], digit_index) and self._strip(cell, pair & ~(1 << digit_index)):
+                    return True
+        return False
 
-    @_transformation
-    def x_wing(self):
-        for div, other_div_name in [(self.row, 'column'), (self.column, 'row')]:
-            for candidate in c.VALID_CANDIDATES:
-                links_found = []
-                for i in range(c.MAGIC_NUM):
-                    link = self.find_strong_link(div(i), candidate)
-                    if link is None:
-                        continue
-                    # TODO: should skip if in same box? Is that possible?
-                    cell_a, cell_b = link
-                    link_pos = {cell_a.position(other_div_name), cell_b.position(other_div_name)}
-                    link_info = (link_pos, (cell_a, cell_b))
-                    for other_link in links_found:
-                        other_link_pos, other_cells = other_link
-                        if other_link_pos == link_pos:
-                            cell_c, cell_d = other_cells
-                            eligible_cells = []
-                            for pos in link_pos:
-                                for cell in self.division(other_div_name, pos):
-                                    if cell.solved:
-                                        continue
-                                    if candidate not in cell:
-                                        continue
-                                    if cell in (cell_a, cell_b, cell_c, cell_d):
-                                        continue
-                                    eligible_cells.append(cell)
-                            if not eligible_cells:
-                                continue
-                            if len({cell_a.box, cell_b.box, cell_c.box,
-                                    cell_d}) != 4:  # TODO: thoroughly test, then take out if impossible
-                                raise ValueError("BOXES CAN HAVE EFFECT ON X WING, CHECK X WING")
-                            for cell in eligible_cells:
-                                cell.remove(candidate)
-                                self.set_cell(cell)
-                            return None
-                    links_found.append(link_info)
+    def _unique_rectangles(self, least: int, *checks) -> bool:
+        masks = self._masks
+        holding = [self._candidate_cells(digit_index) for digit_index in range(c.MAGIC_NUM)]
+        found = False
+        for corners, pair in self._rectangles(holding, least):
+            for check in checks:
+                if any(masks[i] & pair != pair for i in corners):
+                    break  # Changed earlier in this pass
+                roof = [k for k in range(4) if masks[corners[k]] != pair]
+                if check(corners, pair, roof, holding):
+                    if not self.apply_all:
+                        return True
+                    found = True
+        return found
 
     @_transformation
     def unique_rectangles1(self):
-        bi_values = []
-        for x in range(c.MAGIC_NUM):
-            bi_values.append([])
-            for y in range(c.MAGIC_NUM):
-                if y >= x:
-                    break
-                bi_values[x].append([])
-        for cell in self.bi_value_cells:
-            values = cell.candidates
-            a, b = values
-            if a > b:
-                bi_values[a - 1][b - 1].append(cell)
-            else:
-                bi_values[b - 1][a - 1].append(cell)
-        for first_candidate_list in bi_values:
-            for second_candidate_list in first_candidate_list:
-                for _cell_list in itertools.combinations(second_candidate_list, 3):
-                    column_set = {cell.column for cell in _cell_list}
-                    if len(column_set) != 2:
-                        continue
-                    row_set = {cell.row for cell in _cell_list}
-                    if len(row_set) != 2:
-                        continue
-                    box_set = {cell.box for cell in _cell_list}
-                    if len(box_set) != 2:
-                        continue
-                    cell = None
-                    for row in row_set:
-                        for column in column_set:
-                            _cell = self[row][column]
-                            if _cell in _cell_list:
+        return self._unique_rectangles(3, self._ur_type1)
+
+    @_transformation
+    def unique_rectangles(self):
+        # Types 2 to 6; type 5 is type 2 with the extra corners facing each other, or three of them.
+        return self._unique_rectangles(1, self._ur_type2, self._ur_type3, self._ur_type4, self._ur_type6)
+
+    @_transformation
+    def hidden_unique_rectangles1(self):
+        return self._unique_rectangles(1, self._ur_hidden)
+
+    def _fish(self, size: int, fins: bool) -> bool:
+        # For each digit, size base lines (rows, then columns) whose places fall in size cover lines between
+        # them: the digit fills each cover line from the base lines, so the rest of the cover lines lose it.
+        # With fins, base lines can stray outside the cover lines, if only into one box. Either a fin holds the
+        # digit, or the fish stands, so only cover cells in the fin box lose it. Sashimi fish come along too.
+        positions = self._positions
+        masks = self._masks
+        solved = 0
+        for i, mask in enumerate(masks):
+            if not mask & (mask - 1):
+                solved |= 1 << i
+        found = False
+        for digit_index in range(c.MAGIC_NUM):
+            present = self._candidate_cells(digit_index)
+            placed_rows = placed_columns = 0
+            for i in ix.bits(present & solved):
+                placed_rows |= 1 << ix.ROW_OF[i]
+                placed_columns |= 1 << ix.COLUMN_OF[i]
+            for base, cover, placed in ((ix.ROW_UNIT, ix.COLUMN_UNIT, placed_rows),
+                                        (ix.COLUMN_UNIT, ix.ROW_UNIT, placed_columns)):
+                # Lines the digit is already placed in have nothing to add.
+                lines = [0 if placed >> j & 1 else positions[(base + j) * c.MAGIC_NUM + digit_index]
+                         for j in range(c.MAGIC_NUM)]
+                base_sets, cover_sets = ix.LINE_SET_MASKS[base], ix.LINE_SET_MASKS[cover]
+                # Fins sit in one box, next to at least one cover line, so at most BOX_SIZE - 1 places stray.
+                for base_lines, places in u.subsets(lines, size, spare=ix.BOX_SIZE - 1 if fins else 0):
+                    base_cells = base_sets[base_lines]
+                    if places.bit_count() == size:
+                        covers = [places]
+                    else:
+                        covers = []
+                        for box_places in ix.LINE_BOX_PLACES:
+                            inside = places & box_places
+                            needed = size - (places & ~box_places).bit_count()
+                            if 0 < needed < inside.bit_count():
+                                for chosen in itertools.combinations(ix.bits(inside), needed):
+                                    covers.append(places & ~box_places | ix.to_bitset(chosen))
+                    for cover_places in covers:
+                        cover_cells = cover_sets[cover_places]
+                        targets = cover_cells & ~base_cells & present & ~solved
+                        fin_cells = base_cells & present & ~cover_cells
+                        if fin_cells and targets:
+                            box = ix.UNIT_MASKS[ix.BOX_UNIT + ix.BOX_OF[(fin_cells & -fin_cells).bit_length() - 1]]
+                            if fin_cells & ~box:
                                 continue
-                            if cell is not None:
-                                raise ValueError("Should be impossible, should not be two matching cells")
-                            cell = _cell
-                    if cell is None:
-                        raise ValueError("Should be impossible, should be one matching cell")
-                    if _cell_list[0].intersection(cell) == _cell_list[0].candidates:
-                        cell.remove(_cell_list[0].candidates)
-                        self.set_cell(cell)
-                        return None
-        return None
+                            targets &= box
+                        if self._remove_from(targets, digit_index):
+                            if not self.apply_all:
+                                return True
+                            found = True
+        return found
+
+    def _fishes(self, sizes: Iterable[int], fins: bool) -> bool:
+        found = False
+        for size in sizes:
+            if self._fish(size, fins):
+                if not self.apply_all:
+                    return True
+                found = True
+        return found
 
     @_transformation
-    def hidden_unique_rectangles1(self):  # TODO: This one needs some TLC
-        for pair_cell in self.bi_value_cells:  # ceil1_cell #TODO: refactor
-            _poss_cells = self.box(pair_cell.box)
-            _poss_cells.remove(pair_cell)
-            _poss_cells = [x for x in _poss_cells if len(x.intersection(pair_cell)) == 2]
-            _poss_cells = [x for x in _poss_cells if x.row == pair_cell.row or x.column == pair_cell.column]
-            for ceil2_cell in _poss_cells:
-                if ceil2_cell.row == pair_cell.row:
-                    ceil_dir = 'row'
-                    wall_dir = 'column'
-                else:
-                    ceil_dir = 'column'
-                    wall_dir = 'row'
-                _poss_floor1_cells = self.division(wall_dir, pair_cell)
-                _poss_floor1_cells.remove(pair_cell)
-                _poss_floor1_cells = [x for x in _poss_floor1_cells if x.box != pair_cell.box]
-                _poss_floor1_cells = [x for x in _poss_floor1_cells if
-                                      len(x.intersection(pair_cell)) == 2]  # TODO: check?
-                for floor1_cell in _poss_floor1_cells:
-                    # Time to find floor2_cell
-                    # should be aligned in ceil_dir with floor1 and wall_dir with ceil2
-                    floor2_cell = self.division(ceil_dir, floor1_cell)[ceil2_cell.position(wall_dir)]
-                    if floor2_cell.box != floor1_cell.box:
-                        raise ValueError("should be in same box-- logic error in hur1")
-                    if len(floor2_cell.intersection(pair_cell)) != 2:
-                        continue
-                    for candidate in pair_cell.candidates:
-                        # Floor2 strong link with floor1 and ceil2 for this candidate
-                        if not self.are_strongly_linked(floor2_cell, floor1_cell, candidate):
-                            continue
-                        if not self.are_strongly_linked(floor2_cell, ceil2_cell, candidate):
-                            continue
-                        # Okay! Can remove other candidate from floor2_cell (catty-corner from pair_cell)
-                        other_candidate = (pair_cell.candidates - {candidate}).pop()
-                        floor2_cell.remove(other_candidate)
-                        self.set_cell(floor2_cell)
-                        return None  # TODO: Check.. all of this.
-        return None
+    def fish(self, size: int, fins: bool = False):
+        return self._fish(size, fins)
+
+    @_transformation
+    def x_wing(self):
+        return self._fish(2, False)
 
+    # A fish with lines the digit's already placed in is the smaller fish on the rest (down to a lone hidden
+    # single), which these have always found too, so each also tries the sizes below it.
     @_transformation
     def swordfish(self):
-        for candidate in c.VALID_CANDIDATES:
-            for div, other_div in (('row', 'column'), ('column', 'row')):
-                trio_tracker = []
-                for i in range(c.MAGIC_NUM):
-                    cells = self.division(div, i)
-                    cells = [x for x in cells if candidate in x]
-                    if len(cells) <= 3:
-                        trio_tracker.append(cells)
-                if len(trio_tracker) < 3:
+        return self._fishes((1, 2, 3), False)
+
+    @_transformation
+    def jellyfish(self):
+        return self._fishes((1, 2, 3, 4), False)
+
+    @_transformation
+    def finned_fish(self):
+        # Finned (and sashimi) x-wings, swordfish and jellyfish, smallest first.
+        return self._fishes((2, 3, 4), True)
+
+    def _strong_partners(self, digit_index: int) -> dict[int, int]:
+        # Cell index -> bitset of the cells it's strongly linked to for this digit.
+        partners = {}
+        for unit in ix.bits(self._link_units[digit_index]):
+            link = self._link(unit, digit_index)
+            if link is None:
+                continue
+            a, b = link
+            partners[a] = partners.get(a, 0) | 1 << b
+            partners[b] = partners.get(b, 0) | 1 << a
+        return partners
+
+    @staticmethod
+    def _x_chain_ends(partners: dict[int, int], linked: int, cells: int, start: int, min_cells: int,
+                      max_cells: int) -> Generator[tuple[tuple[int, ...], int], None, None]:
+        # Breadth first over (cell, ON?, length) for one digit, from "start is OFF": a strong link turns the other
+        # end ON, a weak link (any peer still holding the digit) turns an ON cell's peer OFF. Lengths from
+        # min_cells up count as one, so each cell is reached a bounded number of times, from the first state to
+        # get there, and a search costs about states x links. Shorter chains are kept apart, so one too short
+        # to count doesn't hide a longer one to the same cell.
+        # Yields (chain, bitset of its cells) for ON cells that see start or share a peer in cells with it,
+        # from min_cells - 1 cells up, shortest chains first, rebuilt from the parents. A chain that comes
+        # back through a cell it already used is left out.
+        parents = {(start, False, 1): None}
+        frontier = [(start, False, 1)]
+        start_peers = ix.PEER_MASKS[start]
+        for length in range(2, max_cells + 1):
+            bucket = min(length, min_cells)
+            reached = []
+            for node in frontier:
+                i, on, _ = node
+                for j in ix.bits((ix.PEER_MASKS[i] if on else partners[i]) & linked):
+                    if (j, not on, bucket) not in parents:
+                        parents[j, not on, bucket] = node
+                        reached.append((j, not on, bucket))
+            if not reached:
+                return
+            frontier = reached
+            if length % 2 or length < min_cells - 1:
+                continue
+            for node in reached:
+                end = node[0]
+                if not start_peers >> end & 1 and not start_peers & ix.PEER_MASKS[end] & cells:
                     continue
-                for div_trio in itertools.combinations(trio_tracker, 3):
-                    other_div_pos = set()
-                    sword_cells = set()
-                    perfect = True
-                    i = 0
-                    for trio in div_trio:
-                        for cell in trio:
-                            i += 1
-                            other_div_pos.add(cell.position(other_div))
-                            sword_cells.add(cell)
-                            if cell.solved:
-                                perfect = False
-                            # TODO: fix?
-                    perfect = perfect and i == 9
-                    if len(other_div_pos) != 3:
-                        continue
-                    eligible_cells = []
-                    for i in other_div_pos:
-                        for cell in self.division(other_div, i):
-                            if cell in sword_cells:
-                                continue
-                            if candidate in cell:
-                                eligible_cells.append(cell)
-                    if not eligible_cells:
-                        continue
-                    for cell in eligible_cells:
-                        cell.remove(candidate)
-                        self.set_cell(cell)
-                    if perfect:
-                        print('Perfect swordfish?')
-                    return None
-        return None
+                chain = []
+                used = 0
+                while node is not None:
+                    chain.append(node[0])
+                    used |= 1 << node[0]
+                    node = parents[node]
+                if used.bit_count() == length:
+                    yield tuple(reversed(chain)), used
 
     @_transformation
     def x_cycle(self, min_length = 5, max_length = 40, _continuous = None):
-        cells_by_candidate = [set() for _ in range(c.MAGIC_NUM + 1)]
-        for cell in self.cells(include_solved= False):
-            for candidate in cell:
-                cells_by_candidate[candidate].add(cell)
-        for candidate, cells in enumerate(cells_by_candidate):
-            if not cells:
-                continue
-            strong_links = self.find_strong_links(candidate, sets=True)
-            if not strong_links:
+        # Every x-cycle comes down to a simple alternating chain for one digit, with both ends ON if start is OFF.
+        # A continuous loop is such a chain whose end sees its start: one of its two alternating halves holds
+        # the digit, so any other cell seeing both halves can't. A discontinuous loop meeting at two weak links
+        # is a chain plus a cell seeing both its ends, which can't hold the digit. Lengths count the cells in
+        # the loop; a loop meeting at two strong links is never looked for.
+        # _continuous=True looks for continuous loops only, _continuous=False for discontinuous ones only.
+        masks = self._masks
+        for candidate in c.VALID_CANDIDATES:
+            digit_index = candidate - 1
+            bit = 1 << digit_index
+            partners = self._strong_partners(digit_index)
+            if not partners:
                 continue
-            linked_cells = set()
-            linked_cells.update(*strong_links)
-            _max_length = min(max_length, len(cells), len(linked_cells) + 1)
-            if _max_length < min_length:
+            cells = 0
+            for i, mask in enumerate(masks):
+                if mask & bit and mask != bit:
+                    cells |= 1 << i
+            linked = 0
+            for i in partners:
+                linked |= 1 << i
+            linked &= cells
+            # Continuous loops are tried before discontinuous ones, shortest first, as the first hit. Once there's a
+            # continuous one, nothing longer is looked at.
+            first = None
+            eliminated = 0
+            for start in ix.bits(linked):
+                max_cells = min(max_length, cells.bit_count())
+                if first is not None and first[0][0] == 0 and not self.apply_all:
+                    max_cells = min(max_cells, first[0][1])
+                for chain, used in self._x_chain_ends(partners, linked, cells, start, min_length, max_cells):
+                    length = len(chain)
+                    if first is not None and first[0][0] == 0 and not self.apply_all and length > first[0][1]:
+                        break
+                    others = cells & ~used
+                    if _continuous is not False and min_length <= length and ix.PEER_MASKS[chain[-1]] >> chain[0] & 1:
+                        sees_even = sees_odd = 0
+                        for i in chain[::2]:
+                            sees_even |= ix.PEER_MASKS[i]
+                        for i in chain[1::2]:
+                            sees_odd |= ix.PEER_MASKS[i]
+                        found = others & sees_even & sees_odd
+                        if found and (first is None or (0, length) < first[0]):
+                            first = (0, length), found
+                        eliminated |= found
+                    if _continuous is not True and min_length <= length + 1 <= max_length:
+                        found = others & ix.PEER_MASKS[chain[0]] & ix.PEER_MASKS[chain[-1]]
+                        if found and (first is None or (1, length) < first[0]):
+                            first = (1, length), found
+                        eliminated |= found
+            if first is None:
                 continue
-            # First, continuous nice loops. Only strong links and even.
-            if _continuous is None or _continuous:
-                for cycle_length in range(min_length, _max_length + 1):
-                    if cycle_length % 2 == 1:
-                        continue
-                    for _cycle in itertools.combinations(strong_links, cycle_length // 2):
-                        cycle_set = set()
-                        cycle_set.update(*_cycle)
-                        if len(cycle_set) != cycle_length:
-                            continue
-                        for cycle in _table_settings(*_cycle):
-                            broken = False
-                            for i in range(cycle_length):  # First cell is OFF. [0] OFF [1] ON [2] OFF [3] ON
-                                if i % 2:
-                                    continue  # {cycle[i], cycle[i-1]} in strong_links
-                                if not cycle[i].inclusive_sees(cycle[i - 1]):
-                                    broken = True
-                                    break
-                            if broken:
-                                continue
-                            groups = [[], []]
-                            for i, ele in enumerate(cycle):
-                                groups[i % 2].append(ele)
-                            eligible_cells = cells - cycle_set
-                            eligible_cells = [x for x in eligible_cells if
-                                              x.seen_by(*groups[0]) and x.seen_by(*groups[1])]
-                            if eligible_cells:
-                                for cell in eligible_cells:
-                                    cell.remove(candidate)
-                                    self.set_cell(cell)
-                                return None
-            if not _continuous:
-                for cycle_length in range(min_length, _max_length + 1):
-                    if cycle_length % 2 == 0:
-                        continue
-                    for _cycle in itertools.combinations(strong_links, (cycle_length + 1) // 2):
-                        cycle_set = set()
-                        cycle_set.update(*_cycle)
-                        if len(cycle_set) != cycle_length:
-                            continue
-                        for cycle in _table_settings(*_cycle):
-                            if cycle[0] != cycle[1]:  # Keep in mind, len(cycle) == cycle_length + 1 since these two ==
-                                continue
-                            broken = False
-                            # Ex: ([0] OFF -> [1] ON) -> ([2] OFF -> [3] ON) -> ([4] OFF -> [5/-1/0] ON)
-                            for i in range(cycle_length):
-                                if i % 2:
-                                    continue
-                                if not cycle[i].inclusive_sees(cycle[i - 1]):
-                                    broken = True
-                                    break
-                            if broken:
-                                continue
-                            # [0] OFF -> [-1] == [0] ON
-                            first_cell = cycle[0]
-                            first_cell.equals(candidate)
-                            self.set_cell(first_cell)
-                            return None
-                for cycle_length in range(min_length, _max_length + 1):
-                    if cycle_length % 2 == 0:
-                        continue
-                    for _cycle in itertools.combinations(strong_links, cycle_length // 2):
-                        cycle_set = set()
-                        cycle_set.update(*_cycle)
-                        if len(cycle_set) != cycle_length - 1:
-                            continue
-                        for cycle in _table_settings(*_cycle):
-                            broken = False
-                            for i in range(cycle_length - 1):
-                                if i % 2 or i == 0:
-                                    continue
-                                if not cycle[i].inclusive_sees(cycle[i - 1]):
-                                    broken = True
-                                    break
-                            if broken:
-                                continue
-                            possible_first_cells = [x for x in cells if
-                                                    x not in cycle_set and x.sees(cycle[0]) and x.sees(cycle[-1])]
-                            if possible_first_cells:
-                                for first_cell in possible_first_cells:
-                                    # First cell [*] is ON ANd sees both ends
-                                    # So, in cycle of 5:
-                                    # [*] ON -> ([0] OFF -> [1] ON) -> ([2] OFF -> [3] ON)
-                                    # [3] sees [*] so implies [*] OFF.
-                                    first_cell.remove(candidate)
-                                    self.set_cell(first_cell)
-                                return None
+            if not self.apply_all:
+                eliminated = first[1]
+            for i in ix.bits(eliminated):
+                if masks[i] & bit:
+                    cell = self.cell_at(i)
+                    cell.remove(candidate)
+                    self.set_cell(cell)
+            if not self.apply_all:
+                return None
 
-    def run_round(self):
+    def run_round(self, scheduler: Optional[Scheduler] = None) -> str:
+        # scheduler decides the order strategies are tried in; without one it's the classic, fixed order,
+        # and nothing about the attempt is recorded.
         for cell in self.cells(include_solved=True):
             if not cell.solved:
                 break
         else:
             return 'Solved.'
-        changed = self.hidden_single_solve()
-        if changed:
-            return 'Hidden single solve had changes.'
-        changed = self.pairs_solve()
-        if changed:
-            return 'Pairs solve had changes.'
-        changed = self.triples_solve()
-        if changed:
-            return 'Triples solve had changes.'
-        changed = self.intersection_removal()
-        if changed:
-            return 'Intersection removal had changes.'
-        changed = self.quads_solve()
-        if changed:
-            return 'Quads solve had changes.'
-        changed = self.hidden_pairs_solve()
-        if changed:
-            return 'Hidden pairs solve had changes.'
-        changed = self.hidden_sets(3)
-        if changed:
-            return 'Hidden triples had changes.'
-        changed = self.bug_squasher()
-        if changed:
-            return 'Bug squasher had changes.'
-        changed = self.x_wing()
-        if changed:
-            return 'X wing had changes.'
-        changed = self.rectangle_elimination()
-        if changed:
-            return 'Rectangle elimination had changes.'
-        changed = self.unique_rectangles1()
-        if changed:
-            return 'Unique rectangles 1 had changes.'
-        changed = self.chute_remote_pairs()
-        if changed:
-            return 'Chute remote pairs had changes.'
-        changed = self.hidden_sets(4)
-        if changed:
-            return 'Hidden quads had changes.'
-        changed = self.swordfish()
-        if changed:
-            return 'Swordfish had changes.'
-        changed = self.y_wing()
-        if changed:
-            return 'Y wing had changes.'
-        changed = self.xyz_wing()
-        if changed:
-            return 'XYZ wing had changes.'
-        changed = self.x_cycle()
-        if changed:
-            return 'X-Cycle had changes.'
-        changed = self.xy_chain()
-        if changed:
-            return 'XY Chain had changes.'
-        changed = self.hidden_unique_rectangles1()
-        if changed:
-            return 'Hidden unique rectangles 1 had changes.'
-        return 'No changes.'
-
-    def solve(self, verbose = False):
-        message = ""
-        while message not in {'No changes.', 'Solved.'}:
-            message = self.run_round()
+        strategy = first_hit(self) if scheduler is None else scheduler.run(self)
+        if strategy is None:
+            return 'No changes.'
+        return strategy.message
+
+    def _is_complete(self) -> bool:
+        # Every digit has exactly one place in every unit.
+        for places in self._positions:
+            if places & (places - 1) or not places:
+                return False
+        return True
+
+    def count_solutions(self, limit: int = 2) -> int:
+        # How many ways the current candidates can be completed, counting no further than limit.
+        return _EXACT_COVER.count_solutions(self._masks, limit)
+
+    def solutions(self) -> Generator["Grid", None, None]:
+        for masks in dlx.DancingLinks().solutions(array(u.MASK_TYPECODE, self._masks)):
+            yield self.from_masks(masks)
+
+    def search(self) -> bool:
+        # Depth-first search with propagation, always branching on the cell with the fewest candidates.
+        # On success the grid holds the (first) solution; otherwise it's left as it was found.
+        token = self.snapshot()
+        self._queue_solved()
+        self._trail = []
+        try:
+            found = self.propagate(hidden_singles=True) and self._search()
+        finally:
+            self._trail = None
+        solution = array(u.MASK_TYPECODE, self._masks)
+        self.restore(token)
+        if not found:
+            return False
+        # Replayed through write_mask from where search started, so every index and the journal see the result.
+        for i, mask in enumerate(solution):
+            self.write_mask(i, mask)
+        self._queue.clear()  # Every cell is solved, so there's nothing left to propagate
+        if not self._is_complete():
+            self.restore(token)
+            return False
+        self._checkpoint()
+        return True
+
+    def _search(self) -> bool:
+        masks = self._masks
+        best = None
+        best_count = c.MAGIC_NUM + 1
+        for i, mask in enumerate(masks):
+            count = mask.bit_count()
+            if count == 0:
+                return False
+            if 1 < count < best_count:
+                best, best_count = i, count
+                if count == 2:
+                    break
+        if best is None:
+            return True  # Every cell solved, and propagation saw no two peers clash
+        mark = len(self._trail)
+        for digit_index in ix.bits(masks[best]):
+            self.write_mask(best, 1 << digit_index)
+            if self.propagate(hidden_singles=True) and self._search():
+                return True
+            self._undo(mark)
+        return False
+
+    def _undo(self, mark: int) -> None:
+        # Puts back every mask the trail recorded past mark, newest first.
+        trail = self._trail
+        masks = self._masks
+        while len(trail) > mark:
+            index, old = trail.pop()
+            masks[index] = old
+        self._queue.clear()
+
+    def exact_search(self) -> bool:
+        # Like search, but whatever propagation leaves goes to the exact cover engine instead of backtracking
+        # in Python, which is what hard 16x16 and 25x25 grids need. On success the grid holds the first
+        # solution the engine finds; otherwise it's left as it was found.
+        token = self.snapshot()
+        self._queue_solved()
+        solution = None
+        if self.propagate(hidden_singles=True):
+            solution = next(_EXACT_COVER.solutions(self._masks), None)
+        if solution is None:
+            self.restore(token)
+            return False
+        masks = self._masks
+        for i, mask in enumerate(solution):
+            if masks[i] != mask:
+                self.write_mask(i, mask)
+        self._queue.clear()  # Every cell is solved, so there's nothing left to propagate
+        self._checkpoint()
+        return True
+
+    def solve(self, verbose = False, mode: str = 'hybrid', scheduler: Optional[Scheduler] = None) -> str:
+        # mode is 'logical' (strategies only), 'search', 'hybrid' (strategies, then search for whatever is left),
+        # or 'exact' (exact_search only). From 16x16 up, hybrid hands what's left to exact_search instead, as
+        # backtracking in Python can take minutes there. Returns whichever of 'logical', 'search' or 'exact'
+        # finished the grid.
+        if mode not in SOLVE_MODES:
+            raise ValueError(f'Invalid solve mode {mode!r}')
+        if mode in {'logical', 'hybrid'}:
+            message = ""
+            while message not in {'No changes.', 'Solved.'}:
+                message = self.run_round(scheduler)
+                if verbose:
+                    print(message)
+            if message == 'Solved.':
+                return 'logical'
+            if mode == 'logical':
+                raise Exception('Could not solve grid.')
+        if mode == 'exact' or c.BOX_SIZE > 3 and mode == 'hybrid':
+            if not self.exact_search():
+                raise Exception('Could not solve grid.')
             if verbose:
-                print(message)
-        if message != 'Solved.':
+                print('Exact cover solved grid.')
+            return 'exact'
+        if not self.search():
             raise Exception('Could not solve grid.')
-
+        if verbose:
+            print('Search solved grid.')
+        return 'search'
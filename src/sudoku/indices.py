@@ -0,0 +1,169 @@
+from typing import Generator
+
+from src.sudoku import constants as c
+
+# Everything here is built once, at import, from constants.MAGIC_NUM, apart from the line set masks,
+# which fill in as they're used.
+# Cells are numbered row-major: index = row * MAGIC_NUM + column.
+# Units are numbered rows first, then columns, then boxes.
+
+BOX_SIZE = c.BOX_SIZE
+CELL_COUNT = c.MAGIC_NUM * c.MAGIC_NUM
+UNIT_COUNT = 3 * c.MAGIC_NUM
+
+ROW_UNIT = 0
+COLUMN_UNIT = c.MAGIC_NUM
+BOX_UNIT = 2 * c.MAGIC_NUM
+
+
+def cell_index(row: int, column: int) -> int:
+    return row * c.MAGIC_NUM + column
+
+
+def _box_of(row: int, column: int) -> int:
+    return (row // BOX_SIZE) * BOX_SIZE + column // BOX_SIZE
+
+
+def _box_cell_of(row: int, column: int) -> int:
+    return (column % BOX_SIZE) + (row % BOX_SIZE) * BOX_SIZE
+
+
+ROW_OF = tuple(i // c.MAGIC_NUM for i in range(CELL_COUNT))
+COLUMN_OF = tuple(i % c.MAGIC_NUM for i in range(CELL_COUNT))
+BOX_OF = tuple(_box_of(ROW_OF[i], COLUMN_OF[i]) for i in range(CELL_COUNT))
+BOX_CELL_OF = tuple(_box_cell_of(ROW_OF[i], COLUMN_OF[i]) for i in range(CELL_COUNT))
+STRIP_OF = tuple(ROW_OF[i] // BOX_SIZE for i in range(CELL_COUNT))
+CHUTE_OF = tuple(COLUMN_OF[i] // BOX_SIZE for i in range(CELL_COUNT))
+
+ROWS = tuple(tuple(cell_index(r, col) for col in range(c.MAGIC_NUM)) for r in range(c.MAGIC_NUM))
+COLUMNS = tuple(tuple(cell_index(r, col) for r in range(c.MAGIC_NUM)) for col in range(c.MAGIC_NUM))
+BOXES = tuple(tuple(sorted((i for i in range(CELL_COUNT) if BOX_OF[i] == b), key=lambda i: BOX_CELL_OF[i]))
+              for b in range(c.MAGIC_NUM))
+# Strips are whole rows laid end to end, chutes whole columns.
+STRIPS = tuple(tuple(i for r in range(s * BOX_SIZE, (s + 1) * BOX_SIZE) for i in ROWS[r])
+               for s in range(BOX_SIZE))
+CHUTES = tuple(tuple(i for col in range(s * BOX_SIZE, (s + 1) * BOX_SIZE) for i in COLUMNS[col])
+               for s in range(BOX_SIZE))
+
+UNITS = ROWS + COLUMNS + BOXES
+CELL_UNITS = tuple((ROW_UNIT + ROW_OF[i], COLUMN_UNIT + COLUMN_OF[i], BOX_UNIT + BOX_OF[i])
+                   for i in range(CELL_COUNT))
+CELL_UNIT_BITS = tuple((1 << row) | (1 << column) | (1 << box) for row, column, box in CELL_UNITS)
+# Where a cell sits inside each of its units, lined up with CELL_UNITS.
+CELL_UNIT_POSITIONS = tuple((COLUMN_OF[i], ROW_OF[i], BOX_CELL_OF[i]) for i in range(CELL_COUNT))
+# For the per-unit digit position index: (unit * MAGIC_NUM, position bit, unit bit) for each of a cell's units.
+CELL_POSITION_SLOTS = tuple(tuple((unit * c.MAGIC_NUM, 1 << place, 1 << unit)
+                                  for unit, place in zip(CELL_UNITS[i], CELL_UNIT_POSITIONS[i]))
+                            for i in range(CELL_COUNT))
+
+DIVISIONS = {'row': ROWS, 'column': COLUMNS, 'box': BOXES, 'strip': STRIPS, 'chute': CHUTES}
+UNIT_OFFSETS = {'row': ROW_UNIT, 'column': COLUMN_UNIT, 'box': BOX_UNIT}
+POSITION_OF = {'row': ROW_OF, 'column': COLUMN_OF, 'box': BOX_OF, 'strip': STRIP_OF, 'chute': CHUTE_OF}
+
+
+def unit_id(division: str, position: int) -> int:
+    try:
+        return UNIT_OFFSETS[division] + position
+    except KeyError:
+        raise ValueError(f'{division} is not a unit') from None
+
+
+def find_unit(indices) -> int | None:
+    # The unit made up of exactly these cells, in unit order, if there is one.
+    indices = tuple(indices)
+    if len(indices) != c.MAGIC_NUM:
+        return None
+    first = indices[0]
+    for unit in CELL_UNITS[first]:
+        if UNITS[unit] == indices:
+            return unit
+    return None
+
+
+def bits(bitset: int) -> Generator[int, None, None]:
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+def to_bitset(indices) -> int:
+    bitset = 0
+    for i in indices:
+        bitset |= 1 << i
+    return bitset
+
+
+def _peers(i: int) -> tuple[int, ...]:
+    # Same order Grid.visible_from has always used: row, then column, then the rest of the box.
+    row, column = ROW_OF[i], COLUMN_OF[i]
+    peers = [x for x in ROWS[row] if x != i]
+    peers.extend(x for x in COLUMNS[column] if x != i)
+    peers.extend(x for x in BOXES[BOX_OF[i]] if ROW_OF[x] != row and COLUMN_OF[x] != column)
+    return tuple(peers)
+
+
+PEERS = tuple(_peers(i) for i in range(CELL_COUNT))
+PEER_MASKS = tuple(to_bitset(peers) for peers in PEERS)
+UNIT_MASKS = tuple(to_bitset(unit) for unit in UNITS)
+DIVISION_MASKS = {name: tuple(to_bitset(cells) for cells in division) for name, division in DIVISIONS.items()}
+# Places along a row or column (as bits of a position mask) that share a box, for each of its boxes.
+LINE_BOX_PLACES = tuple(((1 << BOX_SIZE) - 1) << (k * BOX_SIZE) for k in range(BOX_SIZE))
+
+
+class _LineSetMasks(dict):
+    # Filled in as line sets turn up; a full table would have 2 ** MAGIC_NUM entries.
+    def __init__(self, unit: int):
+        super().__init__({0: 0})
+        self.unit = unit
+
+    def __missing__(self, lines: int) -> int:
+        low = lines & -lines
+        cells = self[lines] = self[lines ^ low] | UNIT_MASKS[self.unit + low.bit_length() - 1]
+        return cells
+
+
+# Cells in any of a set of rows (or columns), by the bitset of those rows (columns).
+LINE_SET_MASKS = {ROW_UNIT: _LineSetMasks(ROW_UNIT), COLUMN_UNIT: _LineSetMasks(COLUMN_UNIT)}
+
+
+def _rectangles() -> tuple[tuple[int, int, int, int], ...]:
+    # Corners in the order (top left, top right, bottom left, bottom right): corner k shares a row with
+    # corner k ^ 1, a column with corner k ^ 2, and faces corner 3 - k.
+    rectangles = []
+    for top in range(c.MAGIC_NUM):
+        for bottom in range(top + 1, c.MAGIC_NUM):
+            for left in range(c.MAGIC_NUM):
+                for right in range(left + 1, c.MAGIC_NUM):
+                    corners = (cell_index(top, left), cell_index(top, right),
+                               cell_index(bottom, left), cell_index(bottom, right))
+                    if len({BOX_OF[i] for i in corners}) == 2:
+                        rectangles.append(corners)
+    return tuple(rectangles)
+
+
+# Every rectangle that could be a deadly pattern: two rows, two columns and two boxes.
+RECTANGLES = _rectangles()
+RECTANGLE_MASKS = tuple(to_bitset(corners) for corners in RECTANGLES)
+
+
+def _cell_rectangles() -> tuple[tuple[int, ...], ...]:
+    cell_rectangles = [[] for _ in range(CELL_COUNT)]
+    for r, corners in enumerate(RECTANGLES):
+        for i in corners:
+            cell_rectangles[i].append(r)
+    return tuple(map(tuple, cell_rectangles))
+
+
+CELL_RECTANGLES = _cell_rectangles()
+
+
+def common_peers(*indices: int) -> int:
+    bitset = PEER_MASKS[indices[0]]
+    for i in indices[1:]:
+        bitset &= PEER_MASKS[i]
+    return bitset
+
+
+def unit_intersection(unit_a: int, unit_b: int) -> int:
+    return UNIT_MASKS[unit_a] & UNIT_MASKS[unit_b]
@@ -0,0 +1,46 @@
+from array import array
+from typing import Generator
+
+from src.sudoku import indices as ix
+
+_NO_CHANGES = array('L', (0,)) * ix.UNIT_COUNT
+
+
+class ChangeJournal:
+    # Records which cells, units and candidates changed since the last checkpoint.
+    def __init__(self):
+        self.cells = 0  # Bitset of cell indices
+        self.units = 0  # Bitset of unit indices
+        self._unit_digits = array('L', _NO_CHANGES)  # Per unit, mask of changed candidates
+
+    def __bool__(self) -> bool:
+        return self.cells != 0
+
+    def record(self, index: int, changed: int) -> None:
+        self.cells |= 1 << index
+        self.units |= ix.CELL_UNIT_BITS[index]
+        unit_digits = self._unit_digits
+        for unit in ix.CELL_UNITS[index]:
+            unit_digits[unit] |= changed
+
+    def checkpoint(self) -> None:
+        if self.cells:
+            self.cells = 0
+            self.units = 0
+            self._unit_digits = array('L', _NO_CHANGES)
+
+    @property
+    def digits(self) -> int:
+        digits = 0
+        for unit_mask in self._unit_digits:
+            digits |= unit_mask
+        return digits
+
+    def unit_digits(self, unit: int) -> int:
+        return self._unit_digits[unit]
+
+    def touched(self, unit: int, digit: int) -> bool:
+        return bool(self._unit_digits[unit] >> (digit - 1) & 1)
+
+    def touched_cells(self) -> Generator[int, None, None]:
+        yield from ix.bits(self.cells)
@@ -0,0 +1,89 @@
+import os
+import re
+from array import array
+from typing import Generator, Iterable
+
+from src.sudoku import constants as c
+from src.sudoku import indices as ix
+from src.sudoku import utilities as u
+
+# Parsing goes straight from text to the flat candidate masks a Grid is built from,
+# without making (or validating) a Cell per square.
+
+# Candidates past 9 are letters, from A, in either case.
+_DIGIT_MASKS = {symbol: u.digit_mask(d) for d, symbol in enumerate(c.SYMBOLS, 1)}
+_DIGIT_MASKS.update({symbol.lower(): mask for symbol, mask in _DIGIT_MASKS.items()})
+_GIVEN_MASKS = {**_DIGIT_MASKS, '.': c.FULL_MASK, '0': c.FULL_MASK}
+_LINE_CHARS = {u.digit_mask(d): symbol for d, symbol in enumerate(c.SYMBOLS, 1)}
+_LETTERS = c.SYMBOLS[9:]
+_TOKEN = re.compile(r'[0-9%s]+' % _LETTERS, re.IGNORECASE)
+_GIVENS_LINE = re.compile(r'[0-9.%s]{%d}' % (_LETTERS, ix.CELL_COUNT), re.IGNORECASE)
+
+
+class ParseError(ValueError):
+    def __init__(self, message: str, line: int | None = None):
+        self.line = line
+        if line is not None:
+            message = f'line {line}: {message}'
+        super().__init__(message)
+
+
+def parse_line(line: str, line_number: int | None = None) -> array:
+    # One puzzle as a line of givens, '.' or '0' for blanks.
+    line = line.strip()
+    if len(line) != ix.CELL_COUNT:
+        raise ParseError(f'expected {ix.CELL_COUNT} characters, found {len(line)}', line_number)
+    try:
+        return array(u.MASK_TYPECODE, map(_GIVEN_MASKS.__getitem__, line))
+    except KeyError as e:
+        raise ParseError(f'unexpected character {e.args[0]!r}', line_number) from None
+
+
+def format_line(masks: Iterable[int]) -> str:
+    # The inverse of parse_line: solved cells as their digit, everything else as '.'.
+    return ''.join(_LINE_CHARS.get(mask, '.') for mask in masks)
+
+
+def parse_pencilmarks(text: str, first_line: int = 1) -> array:
+    # Every run of digits (and letters, past 9) is one cell's candidates, in row-major order;
+    # anything else just separates them.
+    masks = array(u.MASK_TYPECODE)
+    line_number = first_line
+    for line_number, line in enumerate(text.replace(',', '').splitlines(), first_line):
+        for token in _TOKEN.findall(line):
+            mask = 0
+            for char in token:
+                bit = _DIGIT_MASKS.get(char)
+                if bit is None:
+                    raise ParseError(f'candidate {char} not in {c.SYMBOLS}', line_number)
+                if mask & bit:
+                    raise ParseError(f'candidate {char} repeated in {token}', line_number)
+                mask |= bit
+            masks.append(mask)
+        if len(masks) > ix.CELL_COUNT:
+            raise ParseError(f'more than {ix.CELL_COUNT} cells', line_number)
+    if len(masks) != ix.CELL_COUNT:
+        raise ParseError(f'expected {ix.CELL_COUNT} cells, found {len(masks)}', line_number)
+    return masks
+
+
+def parse(text: str) -> array:
+    # Either format: a bare line of givens, or pencilmarks.
+    stripped = text.strip()
+    if _GIVENS_LINE.fullmatch(stripped):
+        return parse_line(stripped)
+    return parse_pencilmarks(text)
+
+
+def iter_lines(lines: Iterable[str], first_line: int = 1) -> Generator[tuple[int, array], None, None]:
+    # One puzzle per line. Blank lines and lines starting with '#' are skipped.
+    for line_number, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield line_number, parse_line(line, line_number)
+
+
+def read_file(path: str | os.PathLike) -> Generator[tuple[int, array], None, None]:
+    with open(path) as f:
+        yield from iter_lines(f)
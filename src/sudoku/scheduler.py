@@ -0,0 +1,119 @@
+import time
+from typing import Iterable, NamedTuple
+
+from src.sudoku import constants as c
+
+
+class Strategy(NamedTuple):
+    name: str
+    message: str  # What run_round reports when this strategy makes progress
+    method: str  # Name of the Grid method that runs it
+    args: tuple = ()
+    cost: float = 1.0  # Rough relative cost of one pass, used before (or instead of) any timing
+
+    def apply(self, grid) -> bool:
+        return bool(getattr(grid, self.method)(*self.args))
+
+
+# The order run_round has always used; newer strategies go on the end.
+CLASSIC = (
+    Strategy('hidden_single', 'Hidden single solve had changes.', 'hidden_single_solve', cost=1),
+    Strategy('pairs', 'Pairs solve had changes.', 'pairs_solve', cost=2),
+    Strategy('triples', 'Triples solve had changes.', 'triples_solve', cost=3),
+    Strategy('intersection_removal', 'Intersection removal had changes.', 'intersection_removal', cost=2),
+    Strategy('quads', 'Quads solve had changes.', 'quads_solve', cost=5),
+    Strategy('hidden_pairs', 'Hidden pairs solve had changes.', 'hidden_pairs_solve', cost=3),
+    Strategy('hidden_triples', 'Hidden triples had changes.', 'hidden_sets', (3,), cost=6),
+    Strategy('bug_squasher', 'Bug squasher had changes.', 'bug_squasher', cost=1),
+    Strategy('x_wing', 'X wing had changes.', 'x_wing', cost=3),
+    Strategy('rectangle_elimination', 'Rectangle elimination had changes.', 'rectangle_elimination', cost=4),
+    Strategy('unique_rectangles1', 'Unique rectangles 1 had changes.', 'unique_rectangles1', cost=2),
+    Strategy('chute_remote_pairs', 'Chute remote pairs had changes.', 'chute_remote_pairs', cost=4),
+    Strategy('hidden_quads', 'Hidden quads had changes.', 'hidden_sets', (4,), cost=10),
+    Strategy('swordfish', 'Swordfish had changes.', 'swordfish', cost=8),
+    Strategy('y_wing', 'Y wing had changes.', 'y_wing', cost=4),
+    Strategy('xyz_wing', 'XYZ wing had changes.', 'xyz_wing', cost=5),
+    Strategy('x_cycle', 'X-Cycle had changes.', 'x_cycle', cost=12),
+    Strategy('xy_chain', 'XY Chain had changes.', 'xy_chain', cost=8),
+    Strategy('hidden_unique_rectangles1', 'Hidden unique rectangles 1 had changes.', 'hidden_unique_rectangles1',
+             cost=10),
+    Strategy('jellyfish', 'Jellyfish had changes.', 'jellyfish', cost=6),
+    Strategy('w_wing', 'W wing had changes.', 'w_wing', cost=2),
+    Strategy('finned_fish', 'Finned fish had changes.', 'finned_fish', cost=10),
+    Strategy('unique_rectangles', 'Unique rectangles had changes.', 'unique_rectangles', cost=4),
+)
+if c.BOX_SIZE != 3:
+    # Chute remote pairs leans on a chute having exactly one box and one line that neither pair cell is in,
+    # which only 9x9 chutes have. At other sizes it can never make changes, so it isn't tried at all.
+    CLASSIC = tuple(strategy for strategy in CLASSIC if strategy.name != 'chute_remote_pairs')
+
+
+def first_hit(grid, strategies: Iterable[Strategy] = CLASSIC) -> Strategy | None:
+    # The first strategy, in the order given, that makes progress on grid. Nothing is timed or kept.
+    for strategy in strategies:
+        if strategy.apply(grid):
+            return strategy
+    return None
+
+
+class Scheduler:
+    # Decides the order strategies are tried in each round, and hears back how each attempt went.
+    # Every strategy still gets tried before a round reports no changes; only the order moves.
+    def __init__(self, strategies: Iterable[Strategy] = CLASSIC):
+        self.strategies = tuple(strategies)
+        self.tries = dict.fromkeys(self.strategies, 0)
+        self.hits = dict.fromkeys(self.strategies, 0)
+        self.seconds = dict.fromkeys(self.strategies, 0.0)
+
+    def order(self) -> tuple[Strategy, ...]:
+        return self.strategies
+
+    def record(self, strategy: Strategy, seconds: float, hit: bool) -> None:
+        self.tries[strategy] += 1
+        self.hits[strategy] += hit
+        self.seconds[strategy] += seconds
+
+    def run(self, grid) -> Strategy | None:
+        # The first strategy, in order, that makes progress on grid.
+        for strategy in self.order():
+            start = time.perf_counter()
+            hit = strategy.apply(grid)
+            self.record(strategy, time.perf_counter() - start, hit)
+            if hit:
+                return strategy
+        return None
+
+    def stats(self) -> dict[str, tuple[int, int, float]]:
+        # name: (tries, hits, seconds)
+        return {s.name: (self.tries[s], self.hits[s], self.seconds[s]) for s in self.strategies}
+
+
+class AdaptiveScheduler(Scheduler):
+    # Tries strategies in order of expected time to progress: mean cost over (smoothed) hit rate,
+    # which is the order that minimises the expected time until the first hit.
+    # Deterministic mode uses the static costs in place of timings, so the order (and so the output)
+    # depends only on which strategies hit, never on how long they took.
+    def __init__(self, strategies: Iterable[Strategy] = CLASSIC, deterministic: bool = False,
+                 seconds_per_cost: float = 1e-4):
+        super().__init__(strategies)
+        self.deterministic = deterministic
+        self.seconds_per_cost = seconds_per_cost  # Scales static costs to seconds until a strategy has been timed
+        self._order = self.strategies
+
+    def _expected(self, strategy: Strategy) -> float:
+        tries = self.tries[strategy]
+        if self.deterministic or not tries:
+            cost = strategy.cost * self.seconds_per_cost
+        else:
+            cost = self.seconds[strategy] / tries
+        return cost * (tries + 2) / (self.hits[strategy] + 1)
+
+    def order(self) -> tuple[Strategy, ...]:
+        return self._order
+
+    def record(self, strategy: Strategy, seconds: float, hit: bool) -> None:
+        super().record(strategy, seconds, hit)
+        if hit:
+            # Reordering only between rounds keeps a round's order fixed while it runs.
+            position = {s: i for i, s in enumerate(self.strategies)}
+            self._order = tuple(sorted(self.strategies, key=lambda s: (self._expected(s), position[s])))
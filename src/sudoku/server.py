@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.sudoku import bulk
+from src.sudoku.bulk import SolveResult
+from src.sudoku.grid import SOLVE_MODES
+
+# A line protocol over TCP or a Unix socket. Each request line is a puzzle, optionally followed by a tab
+# and a deadline in seconds. Each reply line is puzzle, solution (empty on failure) and path or error,
+# tab separated, in the same order as the requests on that connection.
+# A line of just STATS gets the current metrics back as JSON.
+
+
+def _format_reply(result: SolveResult) -> str:
+    return f'{result.puzzle}\t{result.solution or ""}\t{result.path or result.error}\n'
+
+
+class SolveServer:
+    def __init__(self, workers: int | None = None, batch_size: int = 32, batch_delay: float = 0.002,
+                 max_queue: int = 1024, timeout: float = 10.0, mode: str = 'hybrid'):
+        bulk._check_mode(mode)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay  # How long a batch waits to fill up once it has its first request
+        self.max_queue = max_queue  # Readers stop taking requests once this many are waiting
+        self.timeout = timeout
+        self.mode = mode
+        self.metrics = collections.Counter()
+        self._in_flight = 0
+        self._queue = None
+        self._server = None
+
+    def stats(self) -> dict:
+        stats = {'queue_depth': self._queue.qsize() if self._queue else 0, 'in_flight': self._in_flight}
+        stats.update(self.metrics)
+        if self.metrics['batches']:
+            stats['mean_batch'] = self.metrics['batched'] / self.metrics['batches']
+        return stats
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, path: str | None = None) -> asyncio.AbstractServer:
+        self._queue = asyncio.Queue(self.max_queue)
+        self._executor = ProcessPoolExecutor(self.workers)
+        self._slots = asyncio.Semaphore(self.workers)  # Batches handed to the pool at once
+        self._running = set()
+        self._connections = {}
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def close(self) -> None:
+        self._server.close()
+        # Hanging up ends each connection's reads; whatever was already asked for still gets answered.
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._dispatcher.cancel()
+        for task in self._running:
+            task.cancel()
+        self._executor.shutdown(cancel_futures=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        replies = asyncio.Queue()
+        sender = asyncio.create_task(self._send(replies, writer))
+        self._connections[asyncio.current_task()] = writer
+        try:
+            async for raw in reader:
+                line = raw.decode().strip()
+                if not line:
+                    continue
+                if line == 'STATS':
+                    await replies.put((None, None, None))  # Taken when the reply is due, not now
+                    continue
+                future = loop.create_future()
+                puzzle, _, timeout = line.partition('\t')
+                try:
+                    deadline = loop.time() + (float(timeout) if timeout else self.timeout)
+                except ValueError:
+                    future.set_result(_format_reply(SolveResult(0, puzzle, error=f'Invalid deadline {timeout!r}')))
+                    await replies.put((future, None, None))
+                    continue
+                self.metrics['requests'] += 1
+                await replies.put((future, deadline, puzzle))
+                await self._queue.put((puzzle, deadline, future))  # Waits while the queue is full
+        finally:
+            await replies.put(None)
+            await sender
+            writer.close()
+            del self._connections[asyncio.current_task()]
+
+    async def _send(self, replies: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        while (reply := await replies.get()) is not None:
+            future, deadline, puzzle = reply
+            try:
+                if future is None:
+                    line = json.dumps(self.stats()) + '\n'
+                elif deadline is None:
+                    line = future.result()
+                else:
+                    line = await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                self.metrics['timeouts'] += 1
+                line = _format_reply(SolveResult(0, puzzle, error='TimeoutError: deadline exceeded'))
+            try:
+                writer.write(line.encode())
+                await writer.drain()
+            except ConnectionError:
+                break
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            end = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            now = loop.time()
+            live = [request for request in batch if request[1] > now]
+            self.metrics['expired'] += len(batch) - len(live)  # Already answered with a timeout
+            if not live:
+                continue
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run(live))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list) -> None:
+        loop = asyncio.get_running_loop()
+        self.metrics['batches'] += 1
+        self.metrics['batched'] += len(batch)
+        self._in_flight += len(batch)
+        try:
+            items = [(i, puzzle) for i, (puzzle, _, _) in enumerate(batch)]
+            try:
+                results = await loop.run_in_executor(self._executor, bulk._solve_chunk, (self.mode, items))
+            except Exception as e:
+                results = [SolveResult(i, puzzle, error=f'{type(e).__name__}: {e}') for i, puzzle in items]
+            for (_, _, future), result in zip(batch, results):
+                if result.error is not None:
+                    self.metrics['errors'] += 1
+                if not future.done():
+                    future.set_result(_format_reply(result))
+        finally:
+            self._in_flight -= len(batch)
+            self._slots.release()
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8765, path: str | None = None, **options) -> None:
+    server = SolveServer(**options)
+    await server.start(host, port, path)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Serve the solver over a line protocol.')
+    arguments.add_argument('--host', default='127.0.0.1')
+    arguments.add_argument('--port', type=int, default=8765)
+    arguments.add_argument('--path', help='Unix socket to listen on instead of TCP')
+    arguments.add_argument('--workers', type=int)
+    arguments.add_argument('--batch-size', type=int, default=32)
+    arguments.add_argument('--timeout', type=float, default=10.0)
+    arguments.add_argument('--mode', default='hybrid', choices=SOLVE_MODES)
+    options = arguments.parse_args()
+    asyncio.run(serve(options.host, options.port, options.path, workers=options.workers,
+                      batch_size=options.batch_size, timeout=options.timeout, mode=options.mode))
@@ -0,0 +1,69 @@
+from typing import Iterable, Sequence
+
+from src.sudoku import constants as c
+
+# Typecode for arrays of candidate masks; one bit per candidate has to fit.
+MASK_TYPECODE = 'H' if c.MAGIC_NUM <= 16 else 'L'
+
+
+class _MaskDigits(dict):
+    # Filled in as masks turn up; a full table would have 2 ** MAGIC_NUM entries.
+    def __missing__(self, mask: int) -> tuple[int, ...]:
+        digits = self[mask] = tuple(d for d in range(1, c.MAGIC_NUM + 1) if mask >> (d - 1) & 1)
+        return digits
+
+
+# Candidate masks, mapped to their candidates in ascending order.
+MASK_DIGITS = _MaskDigits()
+
+
+def digit_mask(digit: int) -> int:
+    return 1 << (digit - 1)
+
+
+def digits_to_mask(digits: Iterable[int]) -> int:
+    mask = 0
+    for digit in digits:
+        mask |= 1 << (digit - 1)
+    return mask
+
+
+def mask_to_digits(mask: int) -> tuple[int, ...]:
+    return MASK_DIGITS[mask]
+
+
+def mask_symbols(mask: int) -> str:
+    return ''.join(c.SYMBOLS[d - 1] for d in MASK_DIGITS[mask])
+
+
+def mask_value(mask: int) -> int | None:
+    # The candidate held by a single-bit mask, otherwise None.
+    if mask and not mask & (mask - 1):
+        return mask.bit_length()
+    return None
+
+
+def subsets(masks: Sequence[int], size: int, spare: int = 0) -> list[tuple[int, int]]:
+    # Every choice of size entries of masks whose union has size bits (up to size + spare), as (bitset of the
+    # chosen entries, union), in itertools.combinations order. Naked sets pass each cell's candidates, hidden
+    # sets each candidate's places, fish each line's places. Empty entries never get chosen, and a branch
+    # stops once its union is too big.
+    most = size + spare
+    chosen = [(1 << i, mask) for i, mask in enumerate(masks) if mask and mask.bit_count() <= most]
+    found = []
+    if len(chosen) < size:
+        return found
+
+    def extend(start: int, picked: int, union: int, left: int) -> None:
+        for k in range(start, len(chosen) - left + 1):
+            bit, mask = chosen[k]
+            joined = union | mask
+            if joined.bit_count() > most:
+                continue
+            if left > 1:
+                extend(k + 1, picked | bit, joined, left - 1)
+            elif joined.bit_count() >= size:
+                found.append((picked | bit, joined))
+
+    extend(0, 0, 0, size)
+    return found
@@ -0,0 +1,140 @@
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only this module needs it
+    np = None
+
+from src.sudoku import constants as c
+from src.sudoku import indices as ix
+from src.sudoku import parser
+from src.sudoku import utilities as u
+from src.sudoku.bulk import SolveResult
+from src.sudoku.grid import SOLVE_MODES, Grid
+
+# Naked singles, hidden singles and intersection removal (pointing and box-line), applied to a
+# whole batch of grids at once. A batch is an (N, CELL_COUNT) array of the usual candidate masks.
+
+SOLVED = 1
+STUCK = 0
+CONTRADICTION = -1
+
+
+def _segments() -> list[tuple[list[int], list[int], list[int]]]:
+    # Where a box meets a row or column: the (BOX_SIZE) cells in both, the rest of the line, the rest of the box.
+    segments = []
+    for box in ix.BOXES:
+        for line in ix.ROWS + ix.COLUMNS:
+            cells = [i for i in line if i in box]
+            if cells:
+                segments.append((cells, [i for i in line if i not in cells], [i for i in box if i not in cells]))
+    return segments
+
+
+_SEGMENTS = _segments()
+# For each cell, the segments whose rest of line (or rest of box) it's part of.
+_CELL_LINE_SEGMENTS = [[s for s, segment in enumerate(_SEGMENTS) if i in segment[1]] for i in range(ix.CELL_COUNT)]
+_CELL_BOX_SEGMENTS = [[s for s, segment in enumerate(_SEGMENTS) if i in segment[2]] for i in range(ix.CELL_COUNT)]
+
+if np is not None:
+    _DTYPE = np.dtype(u.MASK_TYPECODE)
+    _SHIFTS = np.arange(c.MAGIC_NUM, dtype=_DTYPE)
+    _PEERS = np.array(ix.PEERS)
+    _UNITS = np.array(ix.UNITS)
+    _SEGMENT_CELLS, _SEGMENT_LINE_REST, _SEGMENT_BOX_REST = (np.array(part) for part in zip(*_SEGMENTS))
+    _CELL_LINE_SEGMENTS = np.array(_CELL_LINE_SEGMENTS)
+    _CELL_BOX_SEGMENTS = np.array(_CELL_BOX_SEGMENTS)
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError('Batch propagation needs numpy')
+
+
+def _bits(masks):
+    # One 0/1 entry per candidate, along a new last axis.
+    return (masks[..., None] >> _SHIFTS) & 1
+
+
+def _either(masks, indices):
+    # OR of masks over the last axis of indices.
+    return np.bitwise_or.reduce(masks[:, indices], axis=-1)
+
+
+def _round(m):
+    # One pass of every technique over the (k, CELL_COUNT) masks m, in place. Returns which grids broke.
+    solved_values = np.where(_bits(m).sum(axis=2) == 1, m, 0)
+    m &= ~_either(solved_values, _PEERS)
+
+    unit_bits = _bits(m)[:, _UNITS]  # (k, unit, place, digit)
+    places = unit_bits.sum(axis=2)
+    broken = (places == 0).any(axis=(1, 2))
+    only = unit_bits & (places == 1)[:, :, None, :]
+    unit_hidden = (only << _SHIFTS).sum(axis=3, dtype=_DTYPE)  # Bits are distinct, so the sum is an OR
+    hidden = np.zeros_like(m)
+    for start in (ix.ROW_UNIT, ix.COLUMN_UNIT, ix.BOX_UNIT):
+        # Each division covers every cell exactly once.
+        stop = start + c.MAGIC_NUM
+        hidden[:, _UNITS[start:stop].ravel()] |= unit_hidden[:, start:stop].reshape(len(m), -1)
+    broken |= (hidden & (hidden - 1) != 0).any(axis=1)
+    np.copyto(m, hidden, where=hidden != 0)
+
+    segment = _either(m, _SEGMENT_CELLS)
+    pointing = segment & ~_either(m, _SEGMENT_BOX_REST)  # Only in the segment within its box
+    claiming = segment & ~_either(m, _SEGMENT_LINE_REST)  # Only in the segment within its line
+    m &= ~(_either(pointing, _CELL_LINE_SEGMENTS) | _either(claiming, _CELL_BOX_SEGMENTS))
+
+    broken |= (m == 0).any(axis=1)
+    return broken
+
+
+def propagate_batch(masks) -> tuple["np.ndarray", "np.ndarray"]:
+    # Runs every grid to a fixed point. Returns the new masks, and per grid SOLVED, STUCK or CONTRADICTION.
+    _require_numpy()
+    masks = np.array(masks, dtype=_DTYPE).reshape(-1, ix.CELL_COUNT)
+    status = np.full(len(masks), STUCK, dtype=np.int8)
+    active = np.arange(len(masks))
+    while active.size:
+        m = masks[active]
+        before = m.copy()
+        broken = _round(m)
+        masks[active] = m
+        changed = (m != before).any(axis=1)
+        solved = ~broken & ~changed & (m & (m - 1) == 0).all(axis=1)
+        status[active[broken]] = CONTRADICTION
+        status[active[solved]] = SOLVED
+        active = active[~broken & changed]
+    return masks, status
+
+
+def solve_batch(puzzles: Iterable[str], mode: str = 'hybrid') -> list[SolveResult]:
+    # Like bulk.solve_many, but the basic techniques run over the whole batch first,
+    # and only the grids they can't finish go through Grid.solve one by one.
+    _require_numpy()
+    if mode not in SOLVE_MODES:
+        raise ValueError(f'Invalid solve mode {mode!r}')
+    puzzles = [puzzle.strip() for puzzle in puzzles]
+    results = [None] * len(puzzles)
+    parsed = []
+    rows = []
+    for i, puzzle in enumerate(puzzles):
+        try:
+            rows.append(parser.parse_line(puzzle).tobytes())
+        except parser.ParseError as e:
+            results[i] = SolveResult(i, puzzle, error=f'{type(e).__name__}: {e}')
+        else:
+            parsed.append(i)
+    masks, status = propagate_batch(np.frombuffer(b''.join(rows), dtype=_DTYPE))
+    for row, i in enumerate(parsed):
+        solution = masks[row].tolist()
+        if status[row] == SOLVED:
+            results[i] = SolveResult(i, puzzles[i], parser.format_line(solution), 'logical')
+            continue
+        try:
+            grid = Grid.from_givens(solution)
+            path = grid.solve(mode=mode)
+        except Exception as e:
+            results[i] = SolveResult(i, puzzles[i], error=f'{type(e).__name__}: {e}')
+        else:
+            results[i] = SolveResult(i, puzzles[i], parser.format_line(grid.masks), path)
+    return results
@@ -0,0 +1,71 @@
+import pytest
+from src.sudoku import Grid
+from src.sudoku.bulk import solve_file, solve_many
+
+PUZZLES = [
+    '53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79',
+    '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..',
+    'not a puzzle',
+    '1234567..' + '......8..' + '.' * 63,
+]
+
+
+class TestSolveMany:
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_ordered(self, workers):
+        results = list(solve_many(PUZZLES * 2, workers=workers, chunksize=1, mode='search'))
+        assert [r.index for r in results] == list(range(8))
+        assert [r.puzzle for r in results] == PUZZLES * 2
+        for result in results[:2]:
+            assert result.error is None
+            assert result.path == 'search'
+            assert '.' not in result.solution
+            grid = Grid.text_to_grid(result.solution)
+            assert grid.count_solutions() == 1
+            assert all(given in {'.', solved} for given, solved in zip(result.puzzle, result.solution))
+        assert results[2].solution is None
+        assert results[2].error.startswith('ParseError')
+        assert results[3].error == 'Exception: Could not solve grid.'
+
+    def test_unordered(self):
+        results = list(solve_many(PUZZLES, workers=2, chunksize=1, ordered=False, mode='search'))
+        assert sorted(r.index for r in results) == [0, 1, 2, 3]
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError):
+            solve_many(PUZZLES, mode='guess')
+
+
+class TestSolveFile:
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / 'puzzles.txt'
+        path.write_text('# corpus\n' + '\n'.join(PUZZLES * 3) + '\n\n')
+        return path
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_records_in_order(self, source, tmp_path, workers):
+        destination = tmp_path / 'solved.txt'
+        assert solve_file(source, destination, workers=workers, window=4, chunksize=2, mode='search') == 12
+        records = [line.split('\t') for line in destination.read_text().splitlines()]
+        assert [r[0] for r in records] == PUZZLES * 3
+        assert records[0][2] == 'search'
+        assert Grid.text_to_grid(records[0][1]).count_solutions() == 1
+        assert records[2][1] == ''
+        assert records[2][2].startswith('ParseError')
+        offsets = [int(r[3]) for r in records]
+        assert offsets == sorted(offsets)
+        assert offsets[-1] == len(source.read_bytes()) - 1
+
+    def test_resume(self, source, tmp_path):
+        expected = tmp_path / 'expected.txt'
+        solve_file(source, expected, workers=1, mode='search')
+        destination = tmp_path / 'solved.txt'
+        text = expected.read_bytes()
+        crashed = text[:text.index(b'\n', len(text) // 2) + 20]  # Part way through a record
+        destination.write_bytes(crashed)
+        written = solve_file(source, destination, workers=1, mode='search', resume=True)
+        assert destination.read_bytes() == text
+        assert written == 12 - crashed.count(b'\n')
+        assert solve_file(source, destination, workers=1, mode='search', resume=True) == 0
+        assert solve_file(source, tmp_path / 'new.txt', workers=1, mode='search', resume=True) == 12
@@ -0,0 +1,43 @@
+import pytest
+from src.sudoku import Grid
+from src.sudoku.bulk import solve_many
+
+np = pytest.importorskip('numpy')
+from src.sudoku import parser
+from src.sudoku import vectorized
+
+EASY = '53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79'
+HARD = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+BROKEN = '1234567..' + '......8..' + '.' * 63
+
+
+class TestPropagateBatch:
+    def test_status(self):
+        masks, status = vectorized.propagate_batch([parser.parse_line(p) for p in (EASY, HARD, BROKEN)])
+        assert status.tolist() == [vectorized.SOLVED, vectorized.STUCK, vectorized.CONTRADICTION]
+        assert parser.format_line(masks[0].tolist()) == self.solution(EASY)
+
+    @staticmethod
+    def solution(puzzle):
+        grid = Grid.text_to_grid(puzzle)
+        grid.solve(mode='search')
+        return parser.format_line(grid.masks)
+
+    def test_matches_grid_basics(self):
+        # A stuck grid should be exactly where the same techniques leave a single Grid.
+        masks, status = vectorized.propagate_batch([parser.parse_line(HARD)])
+        grid = Grid.text_to_grid(HARD)
+        while grid.hidden_single_solve() or grid.intersection_removal():
+            pass
+        assert masks[0].tolist() == grid.masks.tolist()
+
+
+class TestSolveBatch:
+    def test_matches_solve_many(self):
+        puzzles = [EASY, HARD, 'not a puzzle', BROKEN]
+        batch = vectorized.solve_batch(puzzles, mode='search')
+        single = list(solve_many(puzzles, workers=1, mode='search'))
+        assert [r.solution for r in batch] == [r.solution for r in single]
+        assert [r.error is None for r in batch] == [True, True, False, False]
+        assert batch[0].path == 'logical'
+        assert batch[1].path == 'search'
@@ -0,0 +1,56 @@
+import pytest
+from src.sudoku import Cell
+
+
+class TestCellCandidates:
+    def test_default_candidates(self):
+        cell = Cell(row=0, column=0)
+        assert cell.candidates == set(range(1, 10))
+        assert len(cell) == 9
+        assert cell.mask == 0b111111111
+        assert not cell.solved
+        assert cell.value is None
+
+    def test_single_candidate_is_solved(self):
+        cell = Cell(4, row=2, column=7)
+        assert cell.solved
+        assert cell.value == 4
+        assert cell.mask == 0b1000
+
+    @pytest.mark.parametrize('candidates', [(0,), (10,), (3, 3)])
+    def test_invalid_candidates(self, candidates):
+        with pytest.raises(ValueError):
+            Cell(*candidates, row=0, column=0)
+
+    def test_membership_and_iteration(self):
+        cell = Cell(9, 2, 5, row=1, column=1)
+        assert list(cell) == [2, 5, 9]
+        assert 5 in cell
+        assert 4 not in cell
+        assert 'a' not in cell
+
+    def test_remove(self):
+        cell = Cell(1, 2, 3, row=0, column=0)
+        cell.remove(2)
+        assert cell.candidates == {1, 3}
+        assert cell.changed
+        cell.remove({3, 4})
+        assert cell.solved
+        assert cell.value == 1
+
+    def test_solved_cells_are_frozen(self):
+        cell = Cell(7, row=0, column=0)
+        cell.remove(7)
+        assert cell.candidates == {7}
+        assert cell.previously_solved
+        assert not cell.changed
+
+    def test_set_operations(self):
+        a = Cell(1, 2, 3, row=0, column=0)
+        b = Cell(2, 3, 4, row=0, column=1)
+        assert a.intersection(b) == {2, 3}
+        assert a.union({5}) == {1, 2, 3, 5}
+        assert a.intersection_mask(b) == 0b110
+        assert a.union_mask(b.mask) == 0b1111
+        with pytest.raises(TypeError):
+            a.intersection([1, 2])
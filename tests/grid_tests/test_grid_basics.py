@@ -1,3 +1,4 @@
+import itertools
 import pytest
 from src.sudoku import Cell, Grid
 
@@ -11,6 +12,20 @@ def assertCellsIdentical(actual, expected):
     assert actual.candidates == expected.candidates
     assert actual == expected
 
+def removedCandidates(before: list[int], grid: Grid) -> set[tuple[int, int]]:
+    # (cell index, digit) for every candidate grid lost since it had masks before.
+    return {(index, digit) for index, (old, new) in enumerate(zip(before, grid.masks))
+            for digit in range(1, 10) if (old & ~new) >> (digit - 1) & 1}
+
+def withoutCandidates(text: str, removals: set[tuple[int, int]]) -> Grid:
+    # The grid for text with each (cell index, digit) taken out, and whatever that solves propagated.
+    grid = Grid.text_to_grid(text)
+    for index, digit in removals:
+        cell = grid.cell_at(index)
+        cell.remove(digit)
+        grid.set_cell(cell)
+    return grid
+
 def assertGridIntegrity(grid : Grid) -> None:
     all_cells = list(grid.cells(include_solved = True))
     assert len(all_cells) == 81
@@ -42,11 +57,134 @@ def assertGridIntegrity(grid : Grid) -> None:
                     break
             assert chute_found
             assert cell in all_cells
+    assert list(grid.bi_value_cells) == [cell for cell in all_cells if len(cell) == 2]
+    assert list(grid.tri_value_cells) == [cell for cell in all_cells if len(cell) == 3]
+    for pair, bitset in grid.bi_value_pairs.items():
+        assert bitset
+        assert all(cell.mask == pair for cell in grid.cells_with_pair(pair))
+    assert sum(bitset.bit_count() for bitset in grid.bi_value_pairs.values()) == len(grid.bi_value_cells)
+    for offset, division in enumerate(('row', 'column', 'box')):
+        for position in range(9):
+            unit = offset * 9 + position
+            cells = grid.division(division, position)
+            for digit in range(1, 10):
+                expected = sum(1 << place for place, cell in enumerate(cells) if digit in cell)
+                assert grid.digit_positions(unit, digit) == expected
+                assert grid.digit_cells(unit, digit) == [cell for cell in cells if digit in cell]
+                assert grid.strong_link(unit, digit) == Grid.find_strong_link(cells, digit)
 
 class TestGridFundamentals:
     def test_grid_init(self):
         assertGridIntegrity(Grid())
 
+    def test_cells_are_views(self):
+        grid = Grid()
+        cell = grid[4][5]
+        cell.remove(7)
+        assert 7 not in grid.column(5)[4]
+        assert 7 not in grid.box(4)[5]
+        assert grid.masks[4 * 9 + 5] == cell.mask
+
+    def test_given_cells_are_adopted(self):
+        cell = Cell(1, 2, row=3, column=3)
+        grid = Grid(cell)
+        assert grid[3][3] is cell
+        cell.remove(1)
+        assert grid[3][3].value == 2
+
+    def test_placement_propagates_to_peers(self):
+        grid = Grid()
+        cell = grid[0][0]
+        cell.equals(5)
+        grid.set_cell(cell)
+        for peer in grid.visible_from(cell, include_solved=True):
+            assert 5 not in peer
+        assert 5 in grid[1][3]
+        assert 5 in grid[4][4]
+
+    def test_propagate_reports_contradictions(self):
+        grid = Grid(Cell(1, 2, row=0, column=1))
+        grid[0][0].equals(1)
+        grid[1][1].equals(2)
+        assert not grid.propagate()
+        grid = Grid(Cell(1, 2, row=0, column=1))
+        grid[0][0].equals(1)
+        assert grid.propagate()
+        assert grid[0][1].value == 2
+
+    def test_change_journal(self):
+        grid = Grid()
+        assert not grid.journal
+        cell = grid[2][4]
+        cell.remove(6)
+        journal = grid.journal
+        assert journal
+        assert list(journal.touched_cells()) == [cell.index]
+        assert journal.digits == 1 << 5
+        assert journal.touched(2, 6)           # Row 2
+        assert journal.touched(9 + 4, 6)       # Column 4
+        assert journal.touched(18 + 1, 6)      # Box 1
+        assert not journal.touched(3, 6)
+        assert journal.units == (1 << 2) | (1 << 9 + 4) | (1 << 18 + 1)
+        assert grid.intersection_removal()
+        assert not grid.journal
+        assert not grid.intersection_removal()
+
+    def test_unit_searches_look_again_after_changes(self):
+        grid = Grid()
+        assert not grid.pairs_solve()
+        grid[0][0].candidates = {1, 2}
+        assert not grid.pairs_solve()
+        grid[0][1].candidates = {1, 2}  # Only row 0 and box 0 changed since the last pass
+        assert grid.pairs_solve()
+        assert 1 not in grid[0][2] and 2 not in grid[1][1]
+
+    def test_strong_links_follow_eliminations(self):
+        grid = Grid()
+        for cell in grid.row(0):
+            if cell.column not in (1, 5):
+                cell.remove(3)
+        a, b = grid[0][1], grid[0][5]
+        assert grid.strong_link(0, 3) == (a, b)
+        assert grid.are_strongly_linked(a, b, 3)
+        assert grid.strong_partners(a, 3) == [b]
+        assert (a, b) in grid.find_strong_links(3)
+        b.remove(3)
+        assert grid.strong_link(0, 3) is None
+        assert not grid.are_strongly_linked(a, b, 3)
+        assert grid.strong_partners(a, 3) == []
+
+    def test_copy_and_bytes(self):
+        grid = Grid(Cell(5, row=0, column=0))
+        copied = grid.copy()
+        assert copied == grid
+        assert hash(copied) == hash(grid)
+        copied[8][8].remove(9)
+        assert copied != grid
+        assert 9 in grid[8][8]
+        restored = Grid.from_bytes(grid.to_bytes())
+        assert restored == grid
+        assertGridIntegrity(restored)
+
+    def test_snapshot_and_restore(self):
+        grid = Grid(Cell(5, row=0, column=0), Cell(3, 7, row=4, column=4))
+        token = grid.snapshot()
+        before = grid.masks
+        view = grid[8][8]
+        view.remove((1, 2, 3))
+        grid.set_cell(Cell(1, row=8, column=0))
+        grid[4][4].remove(3)
+        assert grid.masks != before
+        grid.restore(token)
+        assert grid.masks == before
+        assert view.candidates == set(range(1, 10))
+        assert not grid.journal
+        assertGridIntegrity(grid)
+        grid[4][4].remove(3)
+        grid.restore(token)  # Can be restored more than once
+        assert grid.masks == before
+        assertGridIntegrity(grid)
+
 
 class TestGridSolver:
     def test_solve_specific(self):
@@ -91,6 +229,378 @@ class TestGridSolver:
         assert grid == expected
         assert message == 'Solved.'
 
+    @pytest.mark.parametrize('puzzle', [
+        '..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9',
+        '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..',
+    ])
+    def test_search(self, puzzle):
+        grid = Grid.text_to_grid(puzzle)
+        assert grid.solve(mode='search') == 'search'
+        assertGridIntegrity(grid)
+        assert all(cell.solved for cell in grid.cells())
+        for i, given in enumerate(puzzle):
+            if given != '.':
+                assert grid[i // 9][i % 9].value == int(given)
+        for offset, division in enumerate(('row', 'column', 'box')):
+            for position in range(9):
+                assert {cell.value for cell in grid.division(division, position)} == set(range(1, 10))
+
+    def test_solve_modes(self):
+        puzzle = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+        with pytest.raises(Exception, match='Could not solve grid.'):
+            Grid.text_to_grid(puzzle).solve(mode='logical')
+        searched = Grid.text_to_grid(puzzle)
+        searched.solve(mode='search')
+        grid = Grid.text_to_grid(puzzle)
+        assert grid.solve() in {'logical', 'search'}
+        assert grid == searched
+        exact = Grid.text_to_grid(puzzle)
+        assert exact.solve(mode='exact') == 'exact'
+        assert exact == searched
+        with pytest.raises(ValueError):
+            grid.solve(mode='guess')
+
+    def test_search_backtracks(self):
+        # Thousands of guesses deep; the indexes only catch up with the masks once search is done.
+        puzzle = '......52..8.4......3...9...5.1...6..2..7........3.....6...1..........7.4.......3.'
+        grid = Grid.text_to_grid(puzzle)
+        assert grid.search()
+        exact = Grid.text_to_grid(puzzle)
+        assert exact.exact_search()
+        assert grid == exact
+        assertGridIntegrity(grid)
+
+    def test_search_without_solution(self):
+        grid = Grid.text_to_grid('1234567..' + '......8..' + '.' * 63)  # Both of r0c7 and r0c8 need a 9
+        before = grid.masks
+        assert not grid.search()
+        assert grid.masks == before
+        assert not grid.exact_search()
+        assert grid.masks == before
+        for mode in ('search', 'exact'):
+            with pytest.raises(Exception, match='Could not solve grid.'):
+                grid.solve(mode=mode)
+
+    def test_count_solutions(self):
+        puzzle = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+        grid = Grid.text_to_grid(puzzle)
+        assert grid.count_solutions() == 1
+        solutions = list(grid.solutions())
+        assert len(solutions) == 1
+        grid.solve(mode='search')
+        assert solutions[0] == grid
+        assert Grid.text_to_grid('.' * 9 + puzzle[9:]).count_solutions(limit=50) > 1
+        assert Grid.text_to_grid('1234567..' + '......8..' + '.' * 63).count_solutions() == 0
+        assert Grid().count_solutions(limit=10) == 10
+        assert len(list(itertools.islice(Grid().solutions(), 3))) == 3
+
+    def test_apply_all(self):
+        puzzle = '...247.5.52.....46.41.5...2...8...6...86..2..93......5.....261.695..8.2....7.9...'
+        step = Grid.text_to_grid(puzzle)
+        batch = Grid.text_to_grid(puzzle)
+        batch.apply_all = True
+        assert step.hidden_single_solve()
+        assert batch.hidden_single_solve()
+        assert len(list(batch.cells(include_solved=False))) < len(list(step.cells(include_solved=False)))
+        assertGridIntegrity(batch)
+        rounds = {}
+        for grid in (step, batch):
+            messages = []
+            while not messages or messages[-1] not in {'Solved.', 'No changes.'}:
+                messages.append(grid.run_round())
+            rounds[grid.apply_all] = len(messages)
+            assert messages[-1] == 'Solved.'
+        assert batch == step
+        assert rounds[True] < rounds[False]
+
+    @pytest.mark.parametrize('puzzle', [
+        '...65.....5.....9..63.....461...2..97.9..1.........8..4..2......2.49.67....5.3.4.',
+        '862.........5..1....5.72.6.29...7.5..4....6.........876...2..1.....1683.5...3.2..',
+        '.3..8......5.6.2......4579..5...7.13.1..23.5...9.....7..6..1........8..47........',
+    ])
+    def test_apply_all_chute_remote_pairs(self, puzzle):
+        # Chute remote pairs used to keep going with pairs an earlier elimination in the same pass had solved.
+        grid = Grid.text_to_grid(puzzle)
+        grid.apply_all = True
+        searched = Grid.text_to_grid(puzzle)
+        searched.solve(mode='search')
+        assert grid.solve() == 'logical'
+        assert grid == searched
+
+    X_CYCLE_CONTINUOUS = """
+        3689  368   689  | 1     7    238   | 4     39  5
+        2     3468  4678 | 9     3458 348   | 368   1   3678
+        35789 348   1    | 23458 3458 6     | 238   379 23789
+        4     28    289  | 2358  1    23789 | 38    6   378
+        1     5     89   | 38    6    3789  | 38    2   4
+        68    7     3    | 248   48   248   | 9     5   18
+        367   9     2467 | 346   34   134   | 12356 8   1236
+        368   13468 468  | 7     2    5     | 136   39  1369
+        368   12368 5    | 368   389  1389  | 7     4   12369
+    """
+    X_CYCLE_DISCONTINUOUS = """
+        8   5   19  | 36    179   2   | 4      36   17
+        7   2   136 | 34568 156   345 | 13568  3568 9
+        169 369 4   | 3568  15679 359 | 135678 2    135678
+        69  689 689 | 1     4     7   | 35     35   2
+        3   7   5   | 26    26    8   | 9      1    4
+        12  4   12  | 35    59    359 | 678    68   678
+        4   36  236 | 9     8     1   | 2356   7    356
+        256 1   7   | 245   25    45  | 23568  9    3568
+        259 89  289 | 7     3     6   | 1258   4    158
+    """
+
+    @pytest.mark.parametrize('text, continuous, apply_all, expected', [
+        # 1s: r7c6 = r9c6 - r9c2 = r8c2 - r8c7 = r7c7 - r7c6 loops, so r7c9, r8c9 and r9c9 see both halves.
+        (X_CYCLE_CONTINUOUS, None, False, {(62, 1), (71, 1), (80, 1)}),
+        (X_CYCLE_CONTINUOUS, True, True, {(62, 1), (71, 1), (80, 1)}),
+        # Discontinuous only: 1s r7c7 = r8c7 - r8c2 = r9c2, and r9c9 sees both ends.
+        (X_CYCLE_CONTINUOUS, False, False, {(80, 1)}),
+        # Breadth first, each cell is reached by its shortest chains only, so the 9s the longer ones gave are missed.
+        (X_CYCLE_CONTINUOUS, None, True, {(30, 2), (32, 2), (62, 1), (71, 1), (80, 1)}),
+        # 2s: r8c4 = r5c4 - r5c5 = r8c5, and r8c1 and r8c7 see both ends.
+        (X_CYCLE_DISCONTINUOUS, None, False, {(63, 2), (69, 2)}),
+        (X_CYCLE_DISCONTINUOUS, False, False, {(63, 2), (69, 2)}),
+        (X_CYCLE_DISCONTINUOUS, True, False, set()),
+        (X_CYCLE_DISCONTINUOUS, None, True, {(60, 3), (62, 3), (63, 2), (69, 2), (78, 8), (80, 8)}),
+    ])
+    def test_x_cycle(self, text, continuous, apply_all, expected):
+        grid = Grid.text_to_grid(text)
+        grid.apply_all = apply_all
+        before = grid.masks
+        assert grid.x_cycle(_continuous=continuous) is bool(expected)
+        assert removedCandidates(before, grid) == expected
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_xy_chain(self, apply_all):
+        # r4c1 isn't 4 -> r8c1 is 4 -> r8c8 is 6 -> r5c8 is 4, so r4c9 and r5c2 can't be 4.
+        grid = Grid.text_to_grid("""
+            6   1    4    | 358  2359 2359 | 58    7   2358
+            7   3    9    | 1    245  245  | 4568  468 24568
+            2   5    8    | 347  347  6    | 1     9   34
+            45  479  57   | 457  6    145  | 2     3   4589
+            1   4679 3567 | 2    8    345  | 45679 46  4569
+            8   2    3567 | 9    3457 1345 | 4567  146 456
+            345 468  1356 | 3456 3459 7    | 4689  2   4689
+            45  467  2    | 456  459  8    | 3     46  1
+            9   468  36   | 346  1    234  | 468   5   7
+        """)
+        grid.apply_all = apply_all
+        before = grid.masks
+        assert grid.xy_chain()
+        # r4c1 and r8c1 are a naked pair, not a chain, so r7c1 keeps its 4 and 5.
+        assert removedCandidates(before, grid) == {(35, 4), (37, 4)}
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_x_wing(self, apply_all):
+        # The 3s in columns 1 and 8 are all in rows 1 and 3, so the rest of row 3 loses its 3s.
+        grid = Grid.text_to_grid("""
+            38  2   4  | 6    1  5      | 7   38  9
+            1   368 9  | 348  7  348    | 238 5   2368
+            378 5   67 | 389  2  389    | 1   368 4
+            6   13  8  | 2    9  137    | 5   4   137
+            4   7   2  | 38   5  138    | 6   9   138
+            9   13  5  | 3478 68 134678 | 38  2   1378
+            78  68  3  | 1    4  2      | 9   678 5
+            5   4   67 | 789  68 6789   | 238 1   23678
+            2   9   1  | 5    3  678    | 4   678 678
+        """)
+        grid.apply_all = apply_all
+        before = grid.masks
+        assert grid.x_wing()
+        assert removedCandidates(before, grid) == {(21, 3), (23, 3)}
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_swordfish(self, apply_all):
+        # The 6s in rows 3, 7 and 8 are all in columns 1, 5 and 9, so r1c1, r1c5, r2c9 and r9c9 lose theirs.
+        text = """
+            1689 5  3   | 168 1268 26 | 4   689  7
+            7    2  689 | 168 5    4  | 38  3689 1689
+            168  18 4   | 9   3    7  | 58  2    1568
+            2    18 5   | 3   18   9  | 6   7    4
+            189  4  89  | 168 7    26 | 358 389  2589
+            3    6  7   | 4   28   5  | 1   89   289
+            468  7  2   | 5   46   3  | 9   1    68
+            46   9  1   | 7   46   8  | 2   5    3
+            5    3  68  | 2   9    1  | 7   4    68
+        """
+        grid = Grid.text_to_grid(text)
+        grid.apply_all = apply_all
+        assert not grid.x_wing()
+        assert grid.swordfish()
+        assert grid == withoutCandidates(text, {(0, 6), (4, 6), (17, 6), (80, 6)})
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_jellyfish(self, apply_all):
+        # The 1s in rows 1, 3, 5 and 7 are two to a row in columns 1, 3, 5 and 7, with no three rows in three
+        # columns, so only the jellyfish sees that the other rows lose their 1s in those columns.
+        base = {0: (0, 2), 2: (2, 4), 4: (4, 6), 6: (6, 0)}
+        grid = Grid.from_masks([0b111111110 if row in base and col not in base[row] else 0b111111111
+                                for row in range(9) for col in range(9)])
+        grid.apply_all = apply_all
+        assert not grid.swordfish()
+        before = grid.masks
+        assert grid.jellyfish()
+        assert removedCandidates(before, grid) == {(row * 9 + col, 1) for row in (1, 3, 5, 7, 8) for col in (0, 2, 4, 6)}
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_finned_fish(self, apply_all):
+        # The 8s in rows 3 and 4 are in columns 1 and 9 but for the fin at r3c8, so r2c9, in column 9 and the
+        # fin's box, loses its 8.
+        grid = Grid.text_to_grid("""
+            5    1   7  | 8  9  6    | 2   4  3
+            689  68  3  | 1  4  2    | 569 7  589
+            2    4   69 | 5  3  7    | 169 18 89
+            6789 2   5  | 4  67 19   | 19  3  789
+            4    678 69 | 39 67 1359 | 159 18 2
+            79   3   1  | 2  8  59   | 4   6  579
+            3    5   8  | 6  2  4    | 7   9  1
+            1    9   4  | 7  5  8    | 3   2  6
+            67   67  2  | 39 1  39   | 8   5  4
+        """)
+        grid.apply_all = apply_all
+        for plain in (grid.x_wing, grid.swordfish, grid.jellyfish):
+            assert not plain()
+        before = grid.masks
+        assert grid.finned_fish()
+        assert removedCandidates(before, grid) == {(17, 8)}
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('wing, text, step, batch', [
+        # Pivot r6c9 with pincers r3c9 and r6c4 takes the 6 from r3c4. Pivot r5c5 with r4c4 and r5c8 takes the 3
+        # from r4c8 as well, but step mode meets the lower cells first, as the triple by triple scan did.
+        ('y_wing', """
+            6    9   3  | 14    8  24   | 17 27 5
+            25   25  7  | 169   3  69   | 8  4  16
+            1    4   8  | 56    7  256  | 3  9  26
+            247  127 14 | 39    5  3479 | 6  38 489
+            47   8   6  | 2     19 3479 | 5  13 149
+            9    3   5  | 46    16 8    | 17 27 24
+            8    6   9  | 7     4  1    | 2  5  3
+            35   15  2  | 35689 69 3569 | 4  18 7
+            3457 157 14 | 358   2  35   | 9  6  18
+        """, {(21, 6)}, {(21, 6), (34, 3)}),
+        # Pivot r7c4 with pincers r7c2 and r9c5: r7c5 and r7c6 see all three, so lose their 8s.
+        ('xyz_wing', """
+            9   468  458  | 2   15678 3    | 158   1478 578
+            1   348  2    | 58  5789  789  | 6     3478 35789
+            68  7    358  | 4   1589  689  | 13589 1238 23589
+            48  1489 148  | 7   3     89   | 2     5    6
+            3   26   78   | 1   26    5    | 4     9    78
+            5   29   678  | 68  29    4    | 38    378  1
+            268 38   9    | 358 578   2678 | 1358  138  4
+            7   5    368  | 368 4     1    | 389   238  2389
+            248 1348 1348 | 9   58    28   | 7     6    358
+        """, {(58, 8), (59, 8)}, {(58, 8), (59, 8)}),
+        # r5c2 and r8c1 are both 68, and the only 8s in column 8 are in their rows, so the cells seeing both
+        # lose their 6s.
+        ('w_wing', """
+            5    1  6 | 4 8 3  | 9    7  2
+            4    9  8 | 1 7 2  | 5    6  3
+            3    7  2 | 9 6 5  | 1    4  8
+            18   5  3 | 6 2 14 | 48   9  7
+            1268 68 7 | 3 9 14 | 2468 58 456
+            26   4  9 | 7 5 8  | 26   3  1
+            9    68 1 | 5 3 7  | 468  2  46
+            68   3  4 | 2 1 9  | 7    58 56
+            7    2  5 | 8 4 6  | 3    1  9
+        """, {(36, 6), (45, 6), (55, 6)}, {(36, 6), (45, 6), (55, 6)}),
+    ])
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_wings(self, wing, text, step, batch, apply_all):
+        grid = Grid.text_to_grid(text)
+        grid.apply_all = apply_all
+        for other in {'y_wing', 'xyz_wing', 'w_wing'} - {wing}:
+            assert not getattr(grid, other)()
+        assert getattr(grid, wing)()
+        assert grid == withoutCandidates(text, batch if apply_all else step)
+        assertGridIntegrity(grid)
+
+    def test_wing_trace(self):
+        # Step mode finds the y wings the original scan did, in the same order, so a solve takes the same rounds.
+        grid = Grid.text_to_grid('69..8...5....3.84.1...7........5.6...8.2.....935..8...86...12....2...4.7.......6.')
+        messages = []
+        while not messages or messages[-1] not in {'Solved.', 'No changes.'}:
+            messages.append(grid.run_round())
+        assert messages == ['Hidden single solve had changes.'] * 12 + [
+            'Pairs solve had changes.', 'Intersection removal had changes.', 'XY Chain had changes.',
+            'Pairs solve had changes.', 'Y wing had changes.', 'Y wing had changes.', 'Solved.']
+
+    @pytest.mark.parametrize('text, step, batch', [
+        ("""
+            1349 2   13 | 136 156 159 | 468   7 68
+            8    14  13 | 136 7   19  | 246   5 26
+            7    6   5  | 8   2   4   | 3     9 1
+            6    158 4  | 17  9   18  | 57    2 3
+            2    3   7  | 5   4   6   | 1     8 9
+            15   158 9  | 127 3   128 | 57    6 4
+            15   9   16 | 126 156 3   | 25678 4 25678
+            145  145 2  | 9   8   7   | 56    3 56
+            345  457 8  | 246 56  25  | 9     1 2567
+        """,  # Type 2: the 6 on the extra cells goes from the cells that see both
+         {(4, 6), (57, 6), (75, 6)}, {(3, 1), (4, 6), (12, 1), (57, 6), (75, 2), (75, 6)}),
+        ("""
+            38    68  369 | 2  4   7  | 1389  5    1389
+            5     2   379 | 39 89  13 | 13789 4    6
+            378   4   1   | 39 5   36 | 3789  3789 2
+            1247  157 247 | 8  279 35 | 13479 6    13479
+            147   157 8   | 6  79  35 | 2     379  13479
+            9     3   267 | 1  27  4  | 78    78   5
+            478   78  47  | 5  3   2  | 6     1    4789
+            6     9   5   | 4  1   8  | 37    2    37
+            12348 18  234 | 7  6   9  | 3458  38   348
+        """,  # Type 3: the extras 3 and 9 make a naked pair with r3c4 in row 3
+         {(18, 3), (23, 3)}, {(18, 3), (23, 3)}),
+        ("""
+            1349 2   13 | 1369 156 159 | 468   7 68
+            8    14  13 | 1369 7   19  | 246   5 26
+            7    6   5  | 8    2   4   | 3     9 1
+            6    158 4  | 17   9   18  | 57    2 3
+            2    3   7  | 5    4   6   | 1     8 9
+            15   158 9  | 127  3   128 | 57    6 4
+            15   9   16 | 126  156 3   | 25678 4 25678
+            145  145 2  | 1469 8   7   | 56    3 56
+            345  457 8  | 246  56  25  | 9     1 2567
+        """,  # Type 4: 3 is only in the extra cells in column 4, so they lose 1
+         {(3, 1), (12, 1)}, {(3, 1), (12, 1)}),
+        ("""
+            19 5  3  | 168 128 26 | 4   689  7
+            7  2  89 | 168 5   4  | 38  3689 19
+            6  18 4  | 9   3   7  | 58  2    15
+            2  18 5  | 3   18  9  | 6   7    4
+            19 4  89 | 168 7   26 | 358 38   25
+            3  6  7  | 4   28  5  | 1   89   29
+            8  7  2  | 5   4   3  | 9   1    6
+            4  9  1  | 7   6   8  | 2   5    3
+            5  3  6  | 2   9   1  | 7   4    8
+        """,  # Type 6: 3 is only in the corners of both rows and columns, so it fills the pair cells
+         {(16, 3), (42, 3)}, {(16, 3), (42, 3)}),
+    ])
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_unique_rectangles(self, text, step, batch, apply_all):
+        grid = Grid.text_to_grid(text)
+        grid.apply_all = apply_all
+        assert grid.unique_rectangles()
+        assert grid == withoutCandidates(text, batch if apply_all else step)
+        assertGridIntegrity(grid)
+
+    @pytest.mark.parametrize('apply_all', [False, True])
+    def test_unique_rectangle_type3_pair(self, apply_all):
+        # The extras 3 and 4 need only r1c7 to make a naked pair, so the rest of row 1 loses both.
+        masks = [0b111111111] * 81
+        masks[0], masks[3], masks[9], masks[12], masks[6] = 0b111, 0b1011, 0b11, 0b11, 0b1100
+        grid = Grid.from_masks(masks)
+        grid.apply_all = apply_all
+        before = grid.masks
+        assert grid.unique_rectangles()
+        assert removedCandidates(before, grid) == {(index, digit) for index in (1, 2, 4, 5, 7, 8) for digit in (3, 4)}
+        assertGridIntegrity(grid)
+
     def test_hidden_single_solve(self):
         base = r"""
             +----------------+----------------+--------------------+
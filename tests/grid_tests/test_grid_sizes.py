@@ -0,0 +1,103 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+# Every table is built at import for one box size, so each other size gets its own interpreter.
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+
+SOLVE = '''
+import sys
+from src.sudoku import parser
+from src.sudoku.grid import Grid
+from src.sudoku.scheduler import CLASSIC
+
+assert 'chute_remote_pairs' not in {strategy.name for strategy in CLASSIC}
+puzzle = sys.argv[1]
+assert Grid.text_to_grid(puzzle.lower()) == Grid.text_to_grid(puzzle)
+solutions = set()
+for mode in ('hybrid', 'search', 'exact'):
+    grid = Grid.text_to_grid(puzzle)
+    grid.solve(mode=mode)
+    assert Grid.text_to_grid(str(grid)) == grid
+    solutions.add(parser.format_line(grid.masks))
+print(*solutions)
+'''
+
+HYBRID = '''
+import sys
+from src.sudoku import parser
+from src.sudoku.grid import Grid
+
+grid = Grid.text_to_grid(sys.argv[1])
+print(grid.solve(mode='hybrid'), parser.format_line(grid.masks))
+'''
+
+PUZZLES = {
+    2: '.2.1.3..21.33...',
+    4: 'E64C...1A..D..B...A...52...1.....1.......3.2DG8....38....CE6..F9.3E.D.........1.....1...F.DG.52E..B.64.C.52'
+       '..A..D....5..B.17C4.85EC6A1...D4.B2.3.8.D9.3B.1.FE6.C.....6..329.8......24.G...5EF1A.35..GF1A.8..9.......'
+       '..652.7...C..4...B29..GA..367....8.46E..AFG1',
+    5: 'HGP..AE..C...1...4D..B3...L2..M.4.8.6CEK3NB7.I.PG...8...I9HPN5.7.2..1..KCA..N..BL.OF2GH..9CAK..D.8.J'
+       '6A.E.N..5..J.D..G9.H.....E..C..35....M.J.....2F...7.N35.2..LB.G....6CE..MKD..L.F.8JD.O.A..N.5..PH.BI'
+       'D.M.JBP...4.N3.L9...C6A.EIBG....6.A..L.F.K.8D3.N47B..5G2F..1P.I...CM.K....4..IHL.6..E2O1..D8N.45.7.B'
+       'O..FA8.N..CKE6.73G5.HLI..48..NPHL.I...5G.2AFO.M.....E...5....4.JNIP....A12........8.....O.J.34N.P5..'
+       'ND.4....L..G5BP.1..AK..E.G.5B.1O..FIL.9.6.8..4..DN.1F.CD43..E...85..BG9.HILM.6....PG...J43..2.LO..1.'
+       '.J4N7HL.295.B.IO.......6...O...N7...8KM.B5I...1.H2....D5GIPBJ.4..9....AE..C.5.G.FA....29...6..8.74J.'
+       '..9L1.......O..4.7N....5P',
+}
+
+
+# The 25x25 above with a fifth of its givens dropped, which backtracking in Python doesn't finish in minutes.
+HARD = {
+    5: 'HGP...E..C...1...4D..B....L2....4.8.6CEK3N...I.PG...8...I9.PN5...2..1..KCA..N...L.O...H..9CAK....8..'
+       '6A.E.N..5..J.D..G9.H.....E..C..35....M.J.....2F...7.N35.2..L..G....6.E...KD..L...8J..O.A..N.5..PH.B.'
+       'D.M.JBP...4.N3.L....C6A..IBG....6.A......K.8D3.N..B..5G2......I...CM.K.......I.L....E2O.....N.45...B'
+       '....A.....CKE6.73G5.HLI..4...NPHL.I...5G.2AFO.......E...5....4.JN.P....A12........8.....O.J..4N.P...'
+       'ND......L..G5BP....AK..E.G..B.1O...IL.9.6.8..4..DN.1F..D43..E....5..BG9.H.LM......PG...J43..2.LO..1.'
+       '.J4N7...295.B..........6...O...N7...8KM..5I...1.H2......GIPBJ.4..9....AE..C.5...FA....29...6..8.74J.'
+       '..9L1..........4.7N.....P',
+}
+
+
+def _units(line: str, box_size: int) -> list[set[str]]:
+    size = box_size * box_size
+    rows = [line[r * size:(r + 1) * size] for r in range(size)]
+    columns = [line[col::size] for col in range(size)]
+    boxes = [''.join(rows[r][b % box_size * box_size:(b % box_size + 1) * box_size]
+                     for r in range(b // box_size * box_size, (b // box_size + 1) * box_size)) for b in range(size)]
+    return [set(unit) for unit in rows + columns + boxes]
+
+
+class TestGridSizes:
+    @pytest.mark.parametrize('box_size', sorted(PUZZLES))
+    def test_solve(self, box_size):
+        puzzle = PUZZLES[box_size]
+        result = subprocess.run([sys.executable, '-c', SOLVE, puzzle], cwd=ROOT, capture_output=True, text=True,
+                                env={**os.environ, 'SUDOKU_BOX_SIZE': str(box_size)}, timeout=60)
+        assert result.returncode == 0, result.stderr
+        solutions = result.stdout.split()
+        assert len(solutions) == 1  # Every mode agrees
+        solution = solutions[0]
+        assert all(given in {'.', found} for given, found in zip(puzzle, solution))
+        symbols = set('123456789ABCDEFGHIJKLMNOP'[:box_size * box_size])
+        assert all(unit == symbols for unit in _units(solution, box_size))
+
+    @pytest.mark.parametrize('box_size', sorted(HARD))
+    def test_solve_hybrid_hard(self, box_size):
+        puzzle = HARD[box_size]
+        result = subprocess.run([sys.executable, '-c', HYBRID, puzzle], cwd=ROOT, capture_output=True, text=True,
+                                env={**os.environ, 'SUDOKU_BOX_SIZE': str(box_size)}, timeout=30)
+        assert result.returncode == 0, result.stderr
+        path, solution = result.stdout.split()
+        assert path == 'exact'
+        assert all(given in {'.', found} for given, found in zip(puzzle, solution))
+        symbols = set('123456789ABCDEFGHIJKLMNOP'[:box_size * box_size])
+        assert all(unit == symbols for unit in _units(solution, box_size))
+
+    def test_bad_box_size(self):
+        result = subprocess.run([sys.executable, '-c', 'import src.sudoku'], cwd=ROOT, capture_output=True,
+                                text=True, env={**os.environ, 'SUDOKU_BOX_SIZE': '6'}, timeout=60)
+        assert 'Box size 6 not in 2 to 5' in result.stderr
@@ -1,4 +1,10 @@
+import itertools
+import random
+
+from src.sudoku import constants as c
 from src.sudoku import grid as gr
+from src.sudoku import indices as ix
+from src.sudoku import utilities as u
 import pytest
 
 TS_IO = ({'input': (('a', 'A'), ('b', 'B')),
@@ -22,3 +28,40 @@ def test_table_settings(io_dict):
         assert result in expected
         results.append(result)
     assert len(results) == len(expected)
+
+
+def test_peer_tables():
+    for i in range(ix.CELL_COUNT):
+        peers = ix.PEERS[i]
+        assert len(peers) == 20
+        assert len(set(peers)) == 20
+        assert i not in peers
+        for j in peers:
+            assert (ix.ROW_OF[i] == ix.ROW_OF[j] or ix.COLUMN_OF[i] == ix.COLUMN_OF[j]
+                    or ix.BOX_OF[i] == ix.BOX_OF[j])
+            assert ix.PEER_MASKS[j] >> i & 1
+
+
+def test_common_peers():
+    # Two cells in the same row and box share the rest of the row and the rest of the box.
+    a, b = ix.cell_index(0, 0), ix.cell_index(0, 1)
+    assert set(ix.bits(ix.common_peers(a, b))) == ({ix.cell_index(0, col) for col in range(2, 9)}
+                                                   | {ix.cell_index(r, col) for r in (1, 2) for col in range(3)})
+    # Opposite corners of a rectangle only see the other two corners.
+    a, b = ix.cell_index(0, 0), ix.cell_index(4, 4)
+    assert set(ix.bits(ix.common_peers(a, b))) == {ix.cell_index(0, 4), ix.cell_index(4, 0)}
+
+
+@pytest.mark.parametrize('size', [2, 3, 4])
+def test_subsets(size):
+    rng = random.Random(size)
+    for _ in range(200):
+        masks = [rng.choice((0, rng.getrandbits(c.MAGIC_NUM))) for _ in range(c.MAGIC_NUM)]
+        expected = []
+        for combination in itertools.combinations(range(len(masks)), size):
+            union = 0
+            for i in combination:
+                union |= masks[i]
+            if all(masks[i] for i in combination) and union.bit_count() == size:
+                expected.append((ix.to_bitset(combination), union))
+        assert u.subsets(masks, size) == expected
@@ -0,0 +1,74 @@
+import pytest
+from src.sudoku import Cell, Grid
+from src.sudoku import parser
+from src.sudoku.parser import ParseError
+
+PUZZLE = '53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79'
+
+
+class TestGivensLine:
+    def test_parse_line(self):
+        masks = parser.parse_line(PUZZLE)
+        assert len(masks) == 81
+        assert masks[0] == 1 << 4
+        assert masks[2] == 0b111111111
+        assert masks[80] == 1 << 8
+
+    def test_format_line(self):
+        assert parser.format_line(parser.parse_line(PUZZLE)) == PUZZLE
+        assert parser.format_line(parser.parse_line(PUZZLE.replace('.', '0'))) == PUZZLE
+
+    def test_dots_and_zeros_match(self):
+        assert parser.parse_line(PUZZLE) == parser.parse_line(PUZZLE.replace('.', '0'))
+
+    def test_matches_grid_built_from_cells(self):
+        cells = [Cell(int(x), row=i // 9, column=i % 9) for i, x in enumerate(PUZZLE) if x != '.']
+        assert Grid.text_to_grid(PUZZLE) == Grid(*cells)
+
+    @pytest.mark.parametrize('line, message', [
+        (PUZZLE[:-1], 'expected 81 characters'),
+        (PUZZLE[:-1] + 'x', "unexpected character 'x'"),
+    ])
+    def test_malformed_line(self, line, message):
+        with pytest.raises(ParseError, match=message) as info:
+            parser.parse_line(line, 7)
+        assert info.value.line == 7
+        assert str(info.value).startswith('line 7: ')
+
+
+class TestPencilmarks:
+    def test_round_trips_through_str(self):
+        grid = Grid.text_to_grid(PUZZLE)
+        assert parser.parse_pencilmarks(str(grid)) == grid.masks
+        assert Grid.text_to_grid(str(grid)) == grid
+
+    @pytest.mark.parametrize('token, message', [('0', 'not in'), ('122', 'repeated')])
+    def test_bad_candidates_report_line(self, token, message):
+        lines = str(Grid.text_to_grid(PUZZLE)).splitlines()
+        lines[5] = lines[5].replace('3', token, 1)
+        with pytest.raises(ParseError, match=message) as info:
+            parser.parse_pencilmarks('\n'.join(lines))
+        assert info.value.line == 6
+
+    def test_cell_count(self):
+        text = str(Grid.text_to_grid(PUZZLE))
+        with pytest.raises(ParseError, match='found 80'):
+            parser.parse_pencilmarks(text[:text.rindex('9')])
+        with pytest.raises(ParseError, match='more than 81'):
+            parser.parse_pencilmarks(text + '\n| 1 2 3 |')
+
+
+class TestPuzzleFiles:
+    def test_iter_lines(self):
+        lines = ['# comment', PUZZLE, '', PUZZLE.replace('.', '0') + '\n']
+        assert [n for n, _ in parser.iter_lines(lines)] == [2, 4]
+
+    def test_read_file_reports_line(self, tmp_path):
+        path = tmp_path / 'puzzles.txt'
+        path.write_text(f'{PUZZLE}\n{PUZZLE}\n{PUZZLE[1:]}\n')
+        puzzles = parser.read_file(path)
+        assert next(puzzles)[0] == 1
+        assert next(puzzles)[0] == 2
+        with pytest.raises(ParseError) as info:
+            next(puzzles)
+        assert info.value.line == 3
@@ -0,0 +1,51 @@
+from src.sudoku import Grid
+from src.sudoku.scheduler import CLASSIC, AdaptiveScheduler, Scheduler, Strategy, first_hit
+
+PUZZLE = '...247.5.52.....46.41.5...2...8...6...86..2..93......5.....261.695..8.2....7.9...'
+
+
+def messages(scheduler=None, puzzle=PUZZLE):
+    grid = Grid.text_to_grid(puzzle)
+    found = []
+    while not found or found[-1] not in {'Solved.', 'No changes.'}:
+        found.append(grid.run_round(scheduler))
+    return found, grid
+
+
+class TestScheduler:
+    def test_classic_order_is_default(self):
+        default, grid = messages()
+        classic, classic_grid = messages(Scheduler())
+        assert default == classic
+        assert grid == classic_grid
+        assert default[-1] == 'Solved.'
+
+    def test_first_hit(self):
+        grid = Grid.text_to_grid(PUZZLE)
+        assert first_hit(grid) is CLASSIC[0]
+        assert first_hit(Grid.text_to_grid(PUZZLE), CLASSIC[3:4]) is CLASSIC[3]
+        assert first_hit(Grid(), CLASSIC) is None
+
+    def test_pinned_order(self):
+        scheduler = Scheduler(CLASSIC[:1])
+        found, grid = messages(scheduler)
+        assert set(found[:-1]) == {'Hidden single solve had changes.'}
+        tries, hits, seconds = scheduler.stats()['hidden_single']
+        assert tries == len(found) - 1
+        assert hits == tries - (found[-1] == 'No changes.')
+        assert seconds > 0
+
+    def test_deterministic_adaptive_is_reproducible(self):
+        first, first_grid = messages(AdaptiveScheduler(deterministic=True))
+        second, second_grid = messages(AdaptiveScheduler(deterministic=True))
+        assert first == second
+        assert first_grid == second_grid == messages()[1]
+
+    def test_hits_move_strategies_forward(self):
+        copy = Strategy('copy', 'Copied.', 'copy', cost=1)
+        scheduler = AdaptiveScheduler((CLASSIC[0], copy), deterministic=True)
+        assert scheduler.order() == (CLASSIC[0], copy)
+        for _ in range(3):
+            scheduler.record(CLASSIC[0], 0.0, False)
+        scheduler.record(copy, 0.0, True)
+        assert scheduler.order() == (copy, CLASSIC[0])
@@ -0,0 +1,51 @@
+import asyncio
+import json
+from src.sudoku.server import SolveServer
+
+EASY = '53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79'
+HARD = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+
+
+async def exchange(server, lines, **start):
+    await server.start(**start)
+    try:
+        if 'path' in start:
+            reader, writer = await asyncio.open_unix_connection(start['path'])
+        else:
+            host, port = server._server.sockets[0].getsockname()[:2]
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write(''.join(line + '\n' for line in lines).encode())
+        await writer.drain()
+        replies = [(await reader.readline()).decode().rstrip('\n') for _ in lines]
+        writer.close()
+        return replies
+    finally:
+        await server.close()
+
+
+class TestSolveServer:
+    def test_replies_in_order(self):
+        server = SolveServer(workers=1, batch_size=4, mode='search')
+        replies = asyncio.run(exchange(server, [EASY, HARD, 'not a puzzle', EASY, 'STATS']))
+        records = [reply.split('\t') for reply in replies[:4]]
+        assert [r[0] for r in records] == [EASY, HARD, 'not a puzzle', EASY]
+        assert all(len(r[1]) == 81 and '.' not in r[1] for r in (records[0], records[1], records[3]))
+        assert records[2][1] == ''
+        assert records[2][2].startswith('ParseError')
+        stats = json.loads(replies[4])
+        assert stats['requests'] == 4
+        assert stats['errors'] == 1
+        assert stats['batched'] == 4
+        assert stats['queue_depth'] == 0
+
+    def test_deadline(self):
+        server = SolveServer(workers=1, mode='search')
+        replies = asyncio.run(exchange(server, [EASY + '\t0', EASY + '\tsoon']))
+        assert replies[0] == f'{EASY}\t\tTimeoutError: deadline exceeded'
+        assert replies[1].endswith("Invalid deadline 'soon'")
+        assert server.metrics['timeouts'] == 1
+
+    def test_unix_socket(self, tmp_path):
+        server = SolveServer(workers=1, mode='search')
+        replies = asyncio.run(exchange(server, [EASY], path=str(tmp_path / 'solver.sock')))
+        assert replies[0].endswith('\tsearch')